@@ -1,11 +1,72 @@
 import socket
 
+import sys
+
+import json
+
 
 
 # Criação do socket
 HOST = 'localhost'
 PORT = 5000
 
+# prefixo que abre uma conexão persistente
+VERSAO_QUADROS = b"\x00WC2"
+
+
+
+'''
++---------------
+| Conexão persistente
++---------------
+'''
+# input: None
+# output: uma dupla (S, L) onde S é um socket novo numa conexão persistente e L é o seu arquivo de leitura
+def conectar():
+	conn = socket.create_connection((HOST, PORT))
+	conn.sendall(VERSAO_QUADROS)
+	return (conn, conn.makefile("rb"))
+
+
+
+# input: o socket e o arquivo de leitura da conexão, e o pedido em dict
+# output: a resposta em dict, ou None se o servidor fechou a conexão
+def pedir(conn, leitor, pedido):
+	texto = json.dumps(pedido).encode("utf-8")
+	conn.sendall(len(texto).to_bytes(4, byteorder = "little") + texto)
+	
+	cabecalho = leitor.read(4)
+	if len(cabecalho) < 4:
+		return None
+	return json.loads(leitor.read(int.from_bytes(cabecalho, byteorder = "little")))
+
+
+
+# input: o tipo dos pedidos ("contagem" ou "palindromo")
+# output: None (envia cada nome lido no terminal na mesma conexão, reconectando se o servidor a fechou)
+def sessaoPersistente(tipo):
+	conn, leitor = conectar()
+	
+	for id, linha in enumerate(sys.stdin):
+		pedido = {"id": id, "arquivo": linha.rstrip("\n"), "tipo": tipo}
+		
+		# tenta na conexão atual e, se ela caiu por ociosidade ou pelo limite de pedidos, numa nova
+		for tentativa in range(2):
+			try:
+				resposta = pedir(conn, leitor, pedido)
+			except OSError:
+				resposta = None
+			if resposta is not None:
+				break
+			leitor.close()
+			conn.close()
+			conn, leitor = conectar()
+		
+		print(resposta["resposta"] if resposta is not None else "Servidor fechou a conexão", flush = True)
+	
+	leitor.close()
+	conn.close()
+
 
 
 '''
@@ -13,15 +74,28 @@ PORT = 5000
 | Camada de interface
 +---------------
 '''
+# uso: python client.py [--manter] [--palindromo]
+# com --manter, envia cada nome lido no terminal (um por linha) na mesma conexão; com --palindromo, pede o maior
+# palíndromo do texto do arquivo em vez das 5 palavras mais frequentes
+palindromo = "--palindromo" in sys.argv[1:]
+if "--manter" in sys.argv[1:]:
+	sessaoPersistente("palindromo" if palindromo else "contagem")
+	sys.exit(0)
+
 with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
 	# conecta com o servidor
 	s.connect((HOST, PORT))
 	
-	# envia o nome do arquivo lido no terminal
-	s.sendall(input().encode("utf-8"))
+	# envia o nome do arquivo lido no terminal (e o tipo do pedido, na linha seguinte)
+	s.sendall((input() + ("\ntipo=palindromo" if palindromo else "")).encode("utf-8"))
 	
-	# recebe as 5 palavras mais frequentes em forma de bytes
-	data = s.recv(1024)
+	# recebe a resposta em forma de bytes, até o servidor fechar a conexão (um palíndromo pode ser longo)
+	partes = []
+	while True:
+		data = s.recv(4096)
+		if not data:
+			break
+		partes.append(data)
 
-# exibe as 5 palavras mais frequentes
-print(data.decode("utf-8"))
+# exibe a resposta
+print(b"".join(partes).decode("utf-8"))
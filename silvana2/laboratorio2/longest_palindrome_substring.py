@@ -1,16 +1,116 @@
+import sys
+
+import random
+
+import time
+
+from array import array
+
+# NumPy is optional: without it, the batch queries of PalindromeIndex take and return plain sequences; only they use
+# it, so it is imported on their first call instead of here (the server and each of its pools import this module)
+numpyModule = None	# the NumPy module, False if it is not installed, or None before the first batch query
+
+
+
+# The NumPy module, or None if it is not installed
+def importNumpy():
+	global numpyModule
+	
+	if numpyModule is None:
+		try:
+			import numpy
+			numpyModule = numpy
+		except ImportError:
+			numpyModule = False
+	
+	return numpyModule or None
+
+
+
+'''
+
+	Palindrome Radii (Manacher)
+
++----------------
+| Input : an string
+| Output: a list with the radius of the longest palindrome around each of the 2n + 1 centers: center c is the
+|         character string[c//2] if c is odd, and the gap before string[c//2] if c is even; the palindrome of
+|         center c and radius r is string[(c - r)//2 : (c + r)//2], so r is also its length
++----------------
+| Time  Complexity: O(n)
+| Space Complexity: O(n)
++----------------
 '''
+def palindromeRadii(string):
+	size = len(string)	# size of string
+	
+	# Declarations
+	sequence = [None]*(2*size + 1)	# string with a separator (None) around each character, so even and odd palindromes both have a center
+	sequence[1::2] = string
+	total = len(sequence)
+	radius = [0]*total	# radius[c]: how far the longest palindrome centered at sequence[c] reaches on each side (its length in string)
+	
+	center = 0	# center of the palindrome that reaches furthest right
+	right = 0	# where that palindrome ends
+	
+	for c in range(total):
+		# Inside the rightmost palindrome, the mirrored center (2*center - c) already gives a lower bound for the radius
+		r = min(radius[2*center - c], right - c) if c < right else 0
+		
+		# Expand around c while both sides match
+		while 0 < c - r and c + r + 1 < total and sequence[c - r - 1] == sequence[c + r + 1]:
+			r += 1
+		radius[c] = r
+		
+		if right < c + r:
+			center, right = c, c + r
+	
+	return radius
+
 
-	Longest Palindrome Substring
+
+'''
+
+	Longest Palindrome Substring (Manacher)
 
 +----------------
 | Input : an string
 | Output: a longest palindrome substring (not unique, rightmost)
 +----------------
-| Time  Complexity: O(n^2)
+| Time  Complexity: O(n)
 | Space Complexity: O(n)
 +----------------
 '''
 def longestPalindrome(string):
+	# Empty string case
+	if len(string) == 0:
+		return ''
+	
+	radius = palindromeRadii(string)
+	length = max(radius)	# length of the palindrome
+	
+	# On a tie, the rightmost center (which is also the rightmost start) wins
+	center = len(radius) - 1 - radius[::-1].index(length)
+	start = (center - length)//2
+	
+	# Return the palindrome
+	return string[start : start + length]
+
+
+
+'''
+
+	Longest Palindrome Substring (tabulation)
+
++----------------
+| Input : an string
+| Output: the same palindrome as longestPalindrome (reference for differential testing)
++----------------
+| Time  Complexity: O(n^2)
+| Space Complexity: O(n)
++----------------
+'''
+def longestPalindromeTabulation(string):
 	size = len(string)	# size of string
 	
 	# Empty string case
@@ -37,6 +137,9 @@ def longestPalindrome(string):
 					tabulation[k%2][i] = True
 					start = i
 					length = k + 1
+				# Otherwise, string[i : j] is not a palindrome (the entry must be cleared: the row is reused by every length of the same parity, so it still holds the previous one's answer)
+				else:
+					tabulation[k%2][i] = False
 			# Otherwise, string[i : j] is not a palindrome
 			else:
 				tabulation[k%2][i] = False
@@ -46,9 +149,482 @@ def longestPalindrome(string):
 
 
 
+'''
+
+	Palindromic Tree (eertree)
+
++----------------
+| Input : characters appended one at a time (or an initial string)
+| Output: every distinct palindromic substring of the text so far, how often each occurs and the longest palindromic suffix
++----------------
+| Time  Complexity: O(1) amortized per append (for a fixed alphabet)
+| Space Complexity: O(n), in flat arrays (about 24 bytes per node plus 4 per character)
++----------------
+| Each node is a distinct palindrome; node 0 is the imaginary root (length -1) and node 1 the empty palindrome.
+| The children of a node (the palindromes c + node + c) are kept in a singly linked list of siblings instead of a
+| dict per node, so a node costs a few array slots and not a Python object.
++----------------
+'''
+class Eertree:
+	def __init__(self, string = ''):
+		self.text = array('I')	# the characters appended so far, as code points
+		
+		# Nodes
+		self.length = array('i', [-1, 0])	# length of the palindrome
+		self.link = array('i', [0, 0])		# suffix link: node of the longest proper palindromic suffix
+		self.end = array('i', [0, 0])		# position where the palindrome first ends in text
+		self.count = array('i', [0, 0])		# positions where the palindrome is the longest palindromic suffix
+		
+		# Edges: node -> first child, child -> next sibling, child -> character added around the parent
+		self.firstChild = array('i', [-1, -1])
+		self.nextSibling = array('i', [-1, -1])
+		self.character = array('I', [0, 0])
+		
+		self.last = 1	# node of the longest palindromic suffix of text
+		self.longest = 1	# node of the longest palindrome found so far
+		
+		self.extend(string)
+	
+	
+	
+	# Child of node through character c, or -1 if there is none
+	def child(self, node, c):
+		child = self.firstChild[node]
+		while child != -1 and self.character[child] != c:
+			child = self.nextSibling[child]
+		return child
+	
+	
+	
+	# Walk the suffix links from node until the palindrome can be extended by the character at position i
+	def extendable(self, node, i):
+		text, length, link = self.text, self.length, self.link
+		c = text[i]
+		while True:
+			start = i - length[node] - 1
+			if 0 <= start and text[start] == c:
+				return node
+			node = link[node]
+	
+	
+	
+	# Append a character; returns True if it created a new distinct palindrome
+	def append(self, character):
+		c = ord(character)
+		i = len(self.text)
+		self.text.append(c)
+		
+		parent = self.extendable(self.last, i)
+		node = self.child(parent, c)
+		created = node == -1
+		
+		if created:
+			node = len(self.length)
+			self.length.append(self.length[parent] + 2)
+			self.end.append(i)
+			self.count.append(0)
+			
+			# The suffix link is the longest palindromic suffix that can be extended by the same character
+			self.link.append(1 if self.length[node] == 1 else self.child(self.extendable(self.link[parent], i), c))
+			
+			# Add node to the children of parent (after the link, which may walk the same children)
+			self.character.append(c)
+			self.firstChild.append(-1)
+			self.nextSibling.append(self.firstChild[parent])
+			self.firstChild[parent] = node
+			
+			if self.length[self.longest] < self.length[node]:
+				self.longest = node
+		
+		self.count[node] += 1
+		self.last = node
+		return created
+	
+	
+	
+	# Append every character of a string
+	def extend(self, string):
+		for character in string:
+			self.append(character)
+	
+	
+	
+	# Number of distinct palindromic substrings (the two roots are not palindromes)
+	def distinctCount(self):
+		return len(self.length) - 2
+	
+	
+	
+	# The palindrome of a node, as a string
+	def palindrome(self, node):
+		end = self.end[node] + 1
+		return ''.join(map(chr, self.text[end - self.length[node] : end]))
+	
+	
+	
+	# The longest palindromic suffix of the text so far
+	def longestSuffix(self):
+		return self.palindrome(self.last)
+	
+	
+	
+	# The longest palindromic substring of the text so far (the first one found, on ties)
+	def longestPalindrome(self):
+		return self.palindrome(self.longest)
+	
+	
+	
+	# Occurrences of every node: a palindrome occurs wherever it or a palindrome containing it as a suffix is the
+	# longest palindromic suffix, so the counts are added along the suffix links, from the newest nodes (which are
+	# never linked from older ones) to the oldest
+	def occurrences(self):
+		occurrences = array('q', self.count)
+		for node in range(len(self.length) - 1, 1, -1):
+			occurrences[self.link[node]] += occurrences[node]
+		return occurrences
+	
+	
+	
+	# Generator of pairs (palindrome, occurrences) for every distinct palindromic substring, in order of discovery
+	def frequencies(self):
+		occurrences = self.occurrences()
+		for node in range(2, len(self.length)):
+			yield (self.palindrome(node), occurrences[node])
+
+
+
+'''
+
+	Palindrome Index
+
++----------------
+| Input : an string, preprocessed once
+| Output: whether string[i : j] is a palindrome, in O(1), and the longest palindrome inside string[i : j],
+|         in O(log n) range-maximum steps, for any i <= j
++----------------
+| Time  Complexity: O(n) to build
+| Space Complexity: O(n): the 2n + 1 Manacher radii, the maximum of each block of BLOCK radii and a sparse table
+|                   over those maxima (n/BLOCK*log n entries)
++----------------
+'''
+class PalindromeIndex:
+	BLOCK = 32	# radii per block of the range-maximum structure
+	
+	def __init__(self, string):
+		self.size = len(string)
+		self.radius = array('i', palindromeRadii(string))
+		
+		# Maximum radius of each block, and sparse[k][b] = maximum of blocks b to b + 2^k - 1
+		blocks = array('i', (max(self.radius[b : b + self.BLOCK]) for b in range(0, len(self.radius), self.BLOCK)))
+		self.sparse = [blocks]
+		while 2**len(self.sparse) <= len(blocks):
+			previous = self.sparse[-1]
+			half = 2**(len(self.sparse) - 1)
+			self.sparse.append(array('i', map(max, previous[: len(previous) - half], previous[half :])))
+	
+	
+	
+	# Maximum radius of the centers first to last (inclusive)
+	def rangeMax(self, first, last):
+		firstBlock, lastBlock = first//self.BLOCK, last//self.BLOCK
+		if firstBlock == lastBlock:
+			return max(self.radius[first : last + 1])
+		
+		# The partial blocks at both ends are scanned, the full ones in between come from the sparse table
+		maximum = max(max(self.radius[first : (firstBlock + 1)*self.BLOCK]), max(self.radius[lastBlock*self.BLOCK : last + 1]))
+		if firstBlock + 1 < lastBlock:
+			level = (lastBlock - firstBlock - 1).bit_length() - 1
+			table = self.sparse[level]
+			maximum = max(maximum, table[firstBlock + 1], table[lastBlock - 2**level])
+		return maximum
+	
+	
+	
+	# Whether string[i : j] is a palindrome: the palindrome around its center must reach both ends
+	def isPalindrome(self, i, j):
+		return self.radius[i + j] >= j - i
+	
+	
+	
+	# Longest palindrome inside string[i : j] (the rightmost one, on ties), as a pair (start, length)
+	def longestPalindromeIn(self, i, j):
+		if j <= i:
+			return (i, 0)
+		
+		# A palindrome of length at least L fits in string[i : j] if, and only if, some center between 2i + L and
+		# 2j - L has radius at least L; this only gets harder as L grows, so L is found by binary search
+		low, high = 1, j - i
+		while low < high:
+			length = (low + high + 1)//2
+			if self.rangeMax(2*i + length, 2*j - length) >= length:
+				low = length
+			else:
+				high = length - 1
+		length = low
+		
+		# The rightmost center that still reaches length (also by binary search, on where the range maximum drops)
+		first, last = 2*i + length, 2*j - length
+		while first < last:
+			middle = (first + last + 1)//2
+			if self.rangeMax(middle, 2*j - length) >= length:
+				first = middle
+			else:
+				last = middle - 1
+		
+		return ((first - length)//2, length)
+	
+	
+	
+	# isPalindrome for many ranges at once: starts and ends are NumPy arrays (or sequences, without NumPy)
+	def isPalindromeBatch(self, starts, ends):
+		numpy = importNumpy()
+		if numpy is None:
+			return [self.isPalindrome(i, j) for i, j in zip(starts, ends)]
+		
+		starts, ends = numpy.asarray(starts), numpy.asarray(ends)
+		return numpy.frombuffer(self.radius, dtype = numpy.int32)[starts + ends] >= ends - starts
+	
+	
+	
+	# longestPalindromeIn for many ranges at once: a pair (starts, lengths) of NumPy arrays (or lists, without NumPy)
+	def longestPalindromeInBatch(self, starts, ends):
+		answers = [self.longestPalindromeIn(int(i), int(j)) for i, j in zip(starts, ends)]
+		palindromeStarts = [start for start, _ in answers]
+		lengths = [length for _, length in answers]
+		
+		numpy = importNumpy()
+		if numpy is None:
+			return (palindromeStarts, lengths)
+		return (numpy.array(palindromeStarts, dtype = numpy.int64), numpy.array(lengths, dtype = numpy.int64))
+
+
+
+'''
+
+	Streaming Longest Palindrome
+
++----------------
+| Input : the size of the window (the longest palindrome looked for), then the text in chunks, in order
+| Output: the longest palindrome of the text read so far with at most window characters (not unique, rightmost);
+|         the same as longestPalindrome whenever the answer is shorter than the window
++----------------
+| Time  Complexity: O(g) per character, g being the number of groups of palindromic suffixes (O(log n), usually 1 or 2)
+| Space Complexity: O(W + L) for a window of W characters and an answer of L characters, whatever the size of the text
++----------------
+| Every palindrome ends at some position, so it is enough to keep the palindromic suffixes of the text read so far:
+| the new ones are the old ones extended by the new character on both sides, plus the character alone. A palindrome
+| with a palindromic suffix d characters shorter has period d, so the suffixes are kept in groups u, u - d, ..., u - k*d:
+| all but the longest are preceded by the same character, and a whole group is extended in O(1).
+| Extending a suffix of length u compares the character u + 1 positions back, so only the last W + 1 characters are
+| kept, and suffixes longer than W are dropped. The window cannot be avoided: finding the exact longest palindrome
+| of a stream needs memory linear in the stream, since the text read so far may turn out to be half of a palindrome.
++----------------
+'''
+class StreamingPalindrome:
+	def __init__(self, window = 1024*1024):
+		# The window holds at least the last character (a single character is always a palindrome)
+		if window < 1:
+			raise ValueError("the window must have at least 1 character")
+		
+		self.window = window	# longest palindrome looked for
+		self.position = 0	# characters read so far
+		self.buffer = ''	# the last characters read; buffer[0] is the character at position offset
+		self.offset = 0
+		
+		self.groups = []	# palindromic suffixes of the text read so far, longest first, as triples (u, d, k): u, u - d, ..., u - k*d
+		
+		self.start = 0	# start position of the palindrome in the text
+		self.length = 0	# length of the palindrome
+		self.text = None	# the palindrome, copied when it leaves the buffer (None while it is still there)
+	
+	
+	
+	# Read the next chunk of text
+	def feed(self, chunk):
+		buffer = self.buffer + chunk
+		offset = self.offset
+		groups = self.groups
+		start, length = self.start, self.length
+		window = self.window
+		
+		for i in range(self.position, self.position + len(chunk)):
+			c = buffer[i - offset]
+			extended = []
+			
+			# Add the arithmetic progression (u, d, k) after the last one, joining them if the step matches
+			def add(u, d, k):
+				if extended:
+					top, step, count = extended[-1]
+					gap = top - count*step - u
+					if count == 0 and (k == 0 or gap == d):
+						extended[-1] = (top, gap, k + 1)
+						return
+					if gap == step and (k == 0 or d == step):
+						extended[-1] = (top, step, count + k + 1)
+						return
+				extended.append((u, d, k))
+			
+			for u, d, k in groups:
+				# The longest suffix of the group is preceded by buffer[i - u - 1]; the others, inside it, all by the same character
+				topExtends = u < i and buffer[i - u - 1 - offset] == c
+				restExtends = 0 < k and buffer[i - u - 1 + d - offset] == c
+				
+				if topExtends and restExtends:
+					add(u + 2, d, k)
+				elif topExtends:
+					add(u + 2, d, 0)
+				elif restExtends:
+					add(u - d + 2, d, k - 1)
+			
+			# The empty suffix becomes a palindrome of length 2 if the previous character is the same, and c alone is one of length 1
+			if 0 < i and buffer[i - 1 - offset] == c:
+				add(2, 0, 0)
+			add(1, 0, 0)
+			groups = extended
+			
+			# Drop the suffixes longer than the window (only the first group can have them)
+			u, d, k = groups[0]
+			if window < u:
+				dropped = (u - window + d - 1)//d if d else 1
+				if k < dropped:
+					del groups[0]
+				else:
+					groups[0] = (u - dropped*d, d, k - dropped)
+			
+			# On a tie, the palindrome ending later (the rightmost) wins
+			if length <= groups[0][0]:
+				length = groups[0][0]
+				start = i - length + 1
+				self.text = None
+		
+		self.position += len(chunk)
+		self.groups = groups
+		self.start, self.length = start, length
+		
+		# Keep only the characters that a palindromic suffix (at most window characters) may still be compared with,
+		# copying the answer first if it is about to leave the buffer
+		keep = max(0, self.position - window - 1)
+		if self.text is None and start < keep:
+			self.text = buffer[start - offset : start - offset + length]
+		if offset < keep:
+			buffer = buffer[keep - offset :]
+			offset = keep
+		self.buffer, self.offset = buffer, offset
+	
+	
+	
+	# The longest palindrome of the text read so far
+	def longest(self):
+		if self.text is not None:
+			return self.text
+		return self.buffer[self.start - self.offset : self.start - self.offset + self.length]
+
+
+
+'''
+
+	Differential Test
+
++----------------
+| Input : number of random strings, maximum size and alphabet
+| Output: None if both engines (and the palindromic tree, against a brute-force count of the palindromic substrings,
+|         the palindrome index, on a random range, and the streaming palindrome, in random chunks) agree on every
+|         string, otherwise the first string where they differ
++----------------
+'''
+def differentialTest(trials, maxSize = 30, alphabet = 'abc'):
+	generator = random.Random(0)
+	
+	for _ in range(trials):
+		# Small alphabets give many palindromes and many ties
+		letters = alphabet[: generator.randint(1, len(alphabet))]
+		string = ''.join(generator.choice(letters) for _ in range(generator.randint(0, maxSize)))
+		
+		if longestPalindrome(string) != longestPalindromeTabulation(string):
+			return string
+		
+		# The palindromic tree, against every palindromic substring counted by brute force
+		tree = Eertree(string)
+		counts = {}
+		for first in range(len(string)):
+			for last in range(first + 1, len(string) + 1):
+				if string[first : last] == string[first : last][::-1]:
+					counts[string[first : last]] = counts.get(string[first : last], 0) + 1
+		suffix = next((string[first :] for first in range(len(string)) if string[first :] == string[first :][::-1]), '')
+		if tree.distinctCount() != len(counts) or dict(tree.frequencies()) != counts or tree.longestSuffix() != suffix:
+			return string
+		
+		# A random range of the string, against the tabulation of that range alone
+		i = generator.randint(0, len(string))
+		j = generator.randint(i, len(string))
+		index = PalindromeIndex(string)
+		start, length = index.longestPalindromeIn(i, j)
+		expected = longestPalindromeTabulation(string[i : j])
+		expectedStart = i + string[i : j].rfind(expected) if expected else i	# the rightmost longest is the last occurrence of its text
+		if (start, length) != (expectedStart, len(expected)) or index.isPalindrome(i, j) != (string[i : j] == string[i : j][::-1]):
+			return string
+		
+		# The same string, read in chunks of random sizes; a palindrome longer than the window has one of window or
+		# window - 1 characters inside it, which is what the stream finds
+		stream = StreamingPalindrome(generator.randint(1, maxSize))
+		position = 0
+		while position < len(string):
+			size = generator.randint(1, 8)
+			stream.feed(string[position : position + size])
+			position += size
+		expected = longestPalindrome(string)
+		if len(expected) <= stream.window and stream.longest() != expected or stream.window < len(expected) and stream.length < stream.window - 1:
+			return string
+	
+	return None
+
+
+
 '''
 
 	Main
 
++----------------
+| Usage: python longest_palindrome_substring.py           (reads one line)
+|        python longest_palindrome_substring.py --check [trials]
+|        python longest_palindrome_substring.py --stream [file] [seconds] [window]
++----------------
+| With --stream, the whole file (or the standard input, if there is no file or it is -), newlines included, is read
+| in chunks; the length and start of the best palindrome so far are reported on the standard error every few
+| seconds (10 by default), and the palindrome itself is printed at the end. Palindromes longer than the window
+| (1048576 characters by default) are not found; a warning says so if the answer fills the window.
++----------------
 '''
-print(longestPalindrome(input()))
\ No newline at end of file
+CHUNK = 1024*1024	# characters read at a time in the streaming mode
+
+if __name__ == "__main__":
+	if sys.argv[1:2] == ["--check"]:
+		trials = int(sys.argv[2]) if 2 < len(sys.argv) else 10000
+		mismatch = differentialTest(trials)
+		print(f"{trials} random strings: " + ("ok" if mismatch is None else f"mismatch on {mismatch!r}"))
+	elif sys.argv[1:2] == ["--stream"]:
+		path = sys.argv[2] if 2 < len(sys.argv) else '-'
+		try:
+			interval = float(sys.argv[3]) if 3 < len(sys.argv) else 10.0
+			window = int(sys.argv[4]) if 4 < len(sys.argv) else 1024*1024
+			stream = StreamingPalindrome(window)
+		except ValueError:
+			sys.exit("usage: python longest_palindrome_substring.py --stream [file] [seconds] [window], with a window of at least 1 character")
+		source = sys.stdin if path == '-' else open(path, mode = 'r')
+		with source:
+			lastReport = time.perf_counter()
+			while True:
+				chunk = source.read(CHUNK)
+				if not chunk:
+					break
+				stream.feed(chunk)
+				
+				if interval <= time.perf_counter() - lastReport:
+					print(f"{stream.position} characters read: longest palindrome has {stream.length} characters, at {stream.start}", file = sys.stderr, flush = True)
+					lastReport = time.perf_counter()
+		
+		if stream.window - 1 <= stream.length:
+			print(f"the palindrome fills the window of {stream.window} characters; a longer one may exist", file = sys.stderr)
+		print(stream.longest())
+	else:
+		print(longestPalindrome(input()))
\ No newline at end of file
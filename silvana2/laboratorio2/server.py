@@ -1,14 +1,52 @@
 import socket
 
+import json
+
+import os
+
+import time
+
+import signal
+
+import multiprocessing
+
+from collections import Counter
+
+from threading import Thread
+
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturoAtrasado
+
+from longest_palindrome_substring import longestPalindrome
+
 
 
 # Criação do socket
 HOST = 'localhost'
 PORT = 5000
 
-server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server.bind((HOST, PORT))
-server.listen(4)
+# tamanho, em caracteres, de cada bloco lido do arquivo
+TAMANHO_DO_BLOCO = 1024*1024
+
+# prefixo que abre uma conexão persistente (vários pedidos na mesma conexão, cada um num quadro)
+VERSAO_QUADROS = b"\x00WC2"
+
+# segundos sem pedidos até o servidor fechar uma conexão persistente
+TEMPO_OCIOSO = 30
+
+# pedidos atendidos numa conexão persistente antes de o servidor fechá-la
+MAX_PEDIDOS_POR_CONEXAO = 1000
+
+# tamanho máximo de um quadro
+MAX_QUADRO = 1024*1024
+
+# processos que calculam os palíndromos, fora do processo que atende as conexões
+PROCESSOS_DE_PALINDROMO = 1
+
+# tamanho máximo, em bytes, do arquivo de um pedido de palíndromo
+MAX_TAMANHO_DO_PALINDROMO = 1024*1024
+
+# segundos que um pedido de palíndromo pode levar
+PRAZO_DO_PALINDROMO = 10
 
 
 
@@ -18,19 +56,31 @@ server.listen(4)
 +---------------
 '''
 # input: nome do arquivo em bytes
-# output: uma dupla (T, E) onde T é o texto completo do arquivo e E é verdadeiro sse o arquivo existe
+# output: uma dupla (A, E) onde A é o arquivo aberto para leitura e E é verdadeiro sse o arquivo existe
 def dados(nomeDoArquivo):
 	name = bytes(nomeDoArquivo).decode("utf-8")	# pega o nome do arquivo em formato str
 	
 	# tenta abrir o arquivo
 	try:
-		# arquivo encontrado
-		with open(name, mode = 'r') as file:
-			# retorna o texto inteiro do arquivo e um sinal de que o arquivo foi encontrado
-			return (file.read(), True)
+		# arquivo encontrado, retorna o arquivo aberto e um sinal de que o arquivo foi encontrado
+		return (open(name, mode = 'r'), True)
 	except FileNotFoundError:
 		# arquivo não encontrado, então retorna um sinal falso
-		return ("", False)
+		return (None, False)
+
+
+
+# input: um arquivo aberto para leitura e o tamanho de cada bloco
+# output: um gerador que lê o arquivo bloco a bloco, sem nunca carregar o arquivo inteiro na memória
+def blocos(file, tamanho = TAMANHO_DO_BLOCO):
+	while True:
+		bloco = file.read(tamanho)
+		
+		# fim do arquivo
+		if not bloco:
+			return
+		
+		yield bloco
 
 
 
@@ -39,19 +89,36 @@ def dados(nomeDoArquivo):
 | Camada de processamento
 +---------------
 '''
-# input: um texto
-# output: as 5 palavras mais frequentes
-def contadorDePalavra(text):
-	wordList = text.split()	# cria uma lista de palavras
-	wordDict = {}	# dict para contar a ocorrência de cada palavra
+# input: um iterável de blocos de texto
+# output: um dict com o número de ocorrências de cada palavra, na ordem em que cada palavra aparece pela primeira vez
+def contarPalavras(blocos):
+	wordDict = Counter()	# dict para contar a ocorrência de cada palavra
+	resto = ""	# pedaço de palavra que ficou no fim do bloco anterior
 	
-	# conta as ocorrências
-	for w in wordList:
-		if w in wordDict:
-			wordDict[w] += 1
+	# conta as ocorrências bloco a bloco
+	for bloco in blocos:
+		text = resto + bloco
+		wordList = text.split()	# cria uma lista com as palavras do bloco
+		
+		# se o bloco não termina em espaço, a última palavra pode continuar no próximo bloco
+		if wordList and not text[-1].isspace():
+			resto = wordList.pop()
 		else:
-			wordDict[w] = 1
+			resto = ""
+		
+		wordDict.update(wordList)
+	
+	# a última palavra do arquivo
+	if resto:
+		wordDict[resto] += 1
 	
+	return wordDict
+
+
+
+# input: um dict com o número de ocorrências de cada palavra
+# output: as 5 palavras mais frequentes
+def maisFrequentes(wordDict):
 	# ordena as palavras da mais frequente para a menos frequente
 	frequencyList = sorted(wordDict.items(), key = lambda item: item[1], reverse = True)
 	fiveWordsList = ""
@@ -62,32 +129,217 @@ def contadorDePalavra(text):
 	
 	# retorna as 5 palavras mais frequentes
 	return fiveWordsList
-	
 
-	
+
+
+# input: um texto
+# output: as 5 palavras mais frequentes
+def contadorDePalavra(text):
+	return maisFrequentes(contarPalavras([text]))
+
+
+
 # input: nome do arquivo em bytes
 # output: as 5 palavras mais frequentes, ou uma mensagem de erro de arquivo não encontrado
 def processamento(nomeDoArquivo):
-	# pega o texto inteiro e se o arquivo existe
-	text, fileFound = dados(nomeDoArquivo)
+	# pega o arquivo aberto e se o arquivo existe
+	file, fileFound = dados(nomeDoArquivo)
 	
 	if fileFound:
-		# se o arquivo existe, retorna as 5 palavras mais frequentes
-		return contadorDePalavra(text).encode("utf-8")
+		# se o arquivo existe, conta as palavras bloco a bloco e retorna as 5 mais frequentes
+		with file:
+			return maisFrequentes(contarPalavras(blocos(file))).encode("utf-8")
 	else:
 		# se o arquivo não existe, retorna uma mensagem de erro de arquivo não encontrado
 		return "Arquivo não encontrado".encode("utf-8")
 
 
 
-# looping do servidor
-loop = True
-while loop:
-	# aceita a conexão
-	conn, addr = server.accept()
+'''
++---------------
+| Palíndromos
++---------------
+'''
+executorDePalindromos = None	# pool de processos dos palíndromos, criado no main
+
+
+
+# --| PrazoEsgotado |-- exceção
+# o cálculo do palíndromo passou do prazo do pedido
+class PrazoEsgotado(Exception):
+	pass
+
+
+
+# input: o caminho do arquivo e o instante (em time.time()) em que o prazo acaba
+# output: o maior palíndromo do texto do arquivo (roda num processo do pool; lança PrazoEsgotado se o prazo acabar antes)
+def calcularPalindromo(caminho, limite):
+	restante = limite - time.time()
+	if restante <= 0:
+		raise PrazoEsgotado()
+	
+	# o alarme interrompe o cálculo no prazo e libera o processo (o setitimer só existe em sistemas Unix)
+	def esgotar(sinal, quadro):
+		raise PrazoEsgotado()
+	
+	alarme = hasattr(signal, "setitimer")
+	if alarme:
+		signal.signal(signal.SIGALRM, esgotar)
+		signal.setitimer(signal.ITIMER_REAL, restante)
+	try:
+		with open(caminho, mode = 'r') as file:
+			return longestPalindrome(file.read())
+	finally:
+		if alarme:
+			signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+
+# input: nome do arquivo em bytes
+# output: o maior palíndromo do texto do arquivo, ou uma mensagem de erro
+def processamentoDoPalindromo(nomeDoArquivo):
+	file, fileFound = dados(nomeDoArquivo)
+	if not fileFound:
+		return "Arquivo não encontrado".encode("utf-8")
+	
+	with file:
+		tamanho = os.fstat(file.fileno()).st_size
+		caminho = os.path.abspath(file.name)
+	
+	if MAX_TAMANHO_DO_PALINDROMO < tamanho:
+		return "Arquivo grande demais".encode("utf-8")
+	
+	# o cálculo roda no pool; esta thread só espera a resposta, no máximo até o prazo
+	futuro = executorDePalindromos.submit(calcularPalindromo, caminho, time.time() + PRAZO_DO_PALINDROMO)
+	try:
+		return futuro.result(timeout = PRAZO_DO_PALINDROMO + 1.0).encode("utf-8")
+	except (PrazoEsgotado, FuturoAtrasado):
+		futuro.cancel()
+		return "Tempo esgotado".encode("utf-8")
+	except (OSError, UnicodeDecodeError):
+		return "Erro ao ler o arquivo".encode("utf-8")
+
+
+
+# input: o socket e o nome do arquivo em bytes
+# output: None (envia o maior palíndromo do arquivo e fecha a conexão; roda numa thread, para o laço do servidor
+# continuar aceitando conexões enquanto o palíndromo é calculado)
+def atenderPalindromo(conn, nomeDoArquivo):
+	with conn:
+		try:
+			conn.sendall(processamentoDoPalindromo(nomeDoArquivo))
+		except OSError:
+			pass
+
+
+
+'''
++---------------
+| Conexão persistente
++---------------
+'''
+# input: o socket, o buffer com os bytes já recebidos e quantos bytes precisam estar nele
+# output: verdadeiro sse o buffer tem essa quantidade (falso se a conexão fechou antes)
+def garantir(conn, buffer, tamanho):
+	while len(buffer) < tamanho:
+		dado = conn.recv(65536)
+		if not dado:
+			return False
+		buffer += dado
+	return True
+
+
+
+# input: o socket e os bytes já recebidos
+# output: None (atende pedidos na mesma conexão até o cliente fechar, ficar ocioso por TEMPO_OCIOSO segundos
+# ou completar MAX_PEDIDOS_POR_CONEXAO pedidos)
+# cada quadro é o tamanho em 4 bytes seguido de um JSON: o pedido é {"id", "arquivo"} e a resposta é {"id", "resposta"}
+# (com "tipo": "palindromo" no pedido, a resposta é o maior palíndromo do arquivo)
+def sessaoPersistente(conn, sobra):
+	buffer = bytearray(sobra)
+	conn.settimeout(TEMPO_OCIOSO)
+	
+	try:
+		if not garantir(conn, buffer, len(VERSAO_QUADROS)) or buffer[:len(VERSAO_QUADROS)] != VERSAO_QUADROS:
+			return
+		del buffer[:len(VERSAO_QUADROS)]
+		
+		for _ in range(MAX_PEDIDOS_POR_CONEXAO):
+			# lê o próximo quadro
+			if not garantir(conn, buffer, 4):
+				break
+			tamanho = int.from_bytes(buffer[:4], byteorder = "little")
+			if MAX_QUADRO < tamanho or not garantir(conn, buffer, 4 + tamanho):
+				break
+			quadro = bytes(buffer[4:4 + tamanho])
+			del buffer[:4 + tamanho]
+			
+			# interpreta o pedido
+			pedido = None
+			try:
+				pedido = json.loads(quadro)
+				operacao = processamentoDoPalindromo if pedido.get("tipo") == "palindromo" else processamento
+				nomeDoArquivo = pedido["arquivo"].encode("utf-8")
+			except (ValueError, KeyError, AttributeError):
+				operacao = None
+				resposta = {"id": pedido.get("id") if isinstance(pedido, dict) else None, "resposta": "Pedido inválido"}
+			
+			# conta as palavras do arquivo pedido (ou calcula o seu maior palíndromo); um arquivo ilegível só
+			# responde este pedido com erro, sem fechar a conexão
+			if operacao is not None:
+				try:
+					resposta = {"id": pedido.get("id"), "resposta": operacao(nomeDoArquivo).decode("utf-8")}
+				except (OSError, ValueError):
+					resposta = {"id": pedido.get("id"), "resposta": "Erro ao ler o arquivo"}
+			
+			# envia a resposta no mesmo formato
+			texto = json.dumps(resposta, ensure_ascii = False).encode("utf-8")
+			conn.sendall(len(texto).to_bytes(4, byteorder = "little") + texto)
+	except OSError:
+		# inclui o tempo ocioso esgotado
+		pass
+	finally:
+		conn.close()
+
+
+
+'''
++---------------
+| Main
++---------------
+'''
+# o main só roda no processo do servidor: os processos do pool (spawn) importam este arquivo de novo
+if __name__ == "__main__":
+	server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	server.bind((HOST, PORT))
+	server.listen(4)
 	
-	# envia as 5 palavras mais frequentes
-	conn.sendall(processamento(conn.recv(1024)))
+	# spawn em vez de fork: as conexões persistentes rodam em threads, e fazer fork de um processo com threads não é seguro
+	executorDePalindromos = ProcessPoolExecutor(
+		max_workers = PROCESSOS_DE_PALINDROMO,
+		mp_context = multiprocessing.get_context("spawn")
+	)
 	
-	# fecha a conexão
-	conn.close()
+	# looping do servidor
+	loop = True
+	while loop:
+		# aceita a conexão
+		conn, addr = server.accept()
+		mensagem = conn.recv(1024)
+		
+		# conexão persistente: atendida numa thread, para não travar as outras conexões enquanto está aberta
+		if mensagem.startswith(VERSAO_QUADROS[:1]):
+			Thread(target = sessaoPersistente, args = (conn, mensagem), daemon = True).start()
+			continue
+		
+		# pedido de palíndromo ("nome do arquivo" e "tipo=palindromo" em linhas separadas): atendido numa thread
+		nomeDoArquivo, _, opcao = mensagem.partition(b"\n")
+		if opcao == b"tipo=palindromo":
+			Thread(target = atenderPalindromo, args = (conn, nomeDoArquivo), daemon = True).start()
+			continue
+		
+		# envia as 5 palavras mais frequentes
+		conn.sendall(processamento(mensagem))
+		
+		# fecha a conexão
+		conn.close()
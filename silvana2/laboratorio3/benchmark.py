@@ -0,0 +1,289 @@
+import sys
+
+import gc
+
+import time
+
+import random
+
+import itertools
+
+import os
+
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+import server
+
+from collections import Counter
+
+# o módulo resource só existe em sistemas Unix
+try:
+	import resource
+except ImportError:
+	resource = None
+
+# o NumPy é opcional: só o benchmark dos motores usa
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+
+'''
++---------------
+| Funções auxiliares
++---------------
+'''
+# input: uma função e seus argumentos
+# output: uma dupla (R, T) onde R é o retorno da função e T é o tempo gasto em segundos
+def cronometrar(funcao, *args):
+	# desliga o coletor de lixo durante a medição, como o timeit faz
+	gc.collect()
+	gc.disable()
+	try:
+		inicio = time.perf_counter()
+		retorno = funcao(*args)
+		return (retorno, time.perf_counter() - inicio)
+	finally:
+		gc.enable()
+
+
+
+# input: uma função e seus argumentos
+# output: uma tripla (R, T, M) onde R é o retorno da função, T é o tempo gasto em segundos
+# e M é o pico de memória do processo em MiB (roda num processo novo, para o pico de uma medição não contaminar a outra)
+def medirEmProcesso(funcao, *args):
+	with ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context("spawn")) as executor:
+		return executor.submit(medir, funcao, *args).result()
+
+
+
+# input: uma função e seus argumentos
+# output: a mesma tripla de medirEmProcesso, medida no processo atual
+def medir(funcao, *args):
+	retorno, tempo = cronometrar(funcao, *args)
+	
+	# ru_maxrss está em KiB no Linux
+	memoria = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024 if resource else float("nan")
+	return (retorno, tempo, memoria)
+
+
+
+# input: o caminho do arquivo a criar e o tamanho dele em MiB
+# output: None (escreve um texto com frequências de palavras de cauda longa)
+def gerarArquivo(caminho, megabytes):
+	random.seed(0)
+	linhas = [" ".join(f"palavra{int(random.paretovariate(1.1))}" for _ in range(12)) + "\n" for _ in range(10000)]
+	bloco = "".join(linhas)
+	
+	with open(caminho, mode = 'w') as file:
+		for _ in range(megabytes*1024*1024//len(bloco) + 1):
+			file.write(bloco)
+
+
+
+# input: o nome do arquivo em bytes
+# output: as 5 palavras mais frequentes, do jeito antigo (lendo o arquivo inteiro para um str)
+def leituraCompleta(nomeDoArquivo):
+	with open(nomeDoArquivo.decode("utf-8"), mode = 'r') as file:
+		return contadorOriginal(file.read())
+
+
+
+# input: um texto
+# output: as 5 palavras mais frequentes, com a contagem original (split do texto inteiro)
+def contadorOriginal(text):
+	wordDict = {}
+	for w in text.split():
+		if w in wordDict:
+			wordDict[w] += 1
+		else:
+			wordDict[w] = 1
+	return ordenacaoCompleta(wordDict, 5)
+
+
+
+# input: o nome do arquivo em bytes, o modo da camada de dados e se a contagem é feita nos bytes
+# output: as 5 palavras mais frequentes, pelo servidor, sem cache e sem processos extras
+def contagemDoServidor(nomeDoArquivo, camadaDeDados, emBytes = True):
+	server.config["camadaDeDados"] = camadaDeDados
+	server.config["contagemEmBytes"] = emBytes
+	server.config["processosDeContagem"] = 1
+	server.cache = server.CacheDeContagens(0, 0)
+	return server.processamento(nomeDoArquivo).decode("utf-8")
+
+
+
+# input: um dict com o número de ocorrências de cada palavra e quantas palavras retornar
+# output: as k palavras mais frequentes, do jeito antigo (ordenando o vocabulário inteiro)
+def ordenacaoCompleta(wordDict, k):
+	frequencyList = sorted(wordDict.items(), key = lambda item: item[1], reverse = True)
+	fiveWordsList = ""
+	
+	for i in range(min(len(frequencyList), k)):
+		fiveWordsList += frequencyList[i][0] + " "
+	
+	return fiveWordsList
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Benchmarks
++---------------
+'''
+# compara o heap de tamanho k com a ordenação completa, num vocabulário de n palavras distintas
+def benchmarkTopK(n = 10**6):
+	# frequências com cauda longa, como em texto real
+	random.seed(0)
+	wordDict = {f"palavra{i}": int(random.paretovariate(1.2)) for i in range(n)}
+	
+	print(f"top-k com {n} palavras distintas")
+	for k in (5, 100, 10000, n):
+		esperado, tempoOrdenacao = cronometrar(ordenacaoCompleta, wordDict, k)
+		obtido, tempoHeap = cronometrar(server.maisFrequentes, wordDict, k)
+		
+		assert obtido == esperado, "o heap e a ordenação discordam"
+		print(f"  k = {k:>8}: ordenação {tempoOrdenacao:.3f}s, heap {tempoHeap:.3f}s")
+
+
+
+# compara a leitura do arquivo inteiro, a leitura em blocos (contando no texto decodificado ou nos bytes) e o mmap; para testar com um arquivo maior que a memória,
+# passe o caminho de um arquivo já existente
+def benchmarkMmap(megabytes = 256, caminho = None):
+	if caminho is None:
+		caminho = "benchmark.txt"
+		gerarArquivo(caminho, int(megabytes))
+	nomeDoArquivo = caminho.encode("utf-8")
+	
+	print(f"camada de dados com {os.path.getsize(caminho)/(1024*1024):.0f} MiB")
+	medicoes = [
+		("read() inteiro", leituraCompleta, nomeDoArquivo),
+		("blocos de texto", contagemDoServidor, nomeDoArquivo, "texto", False),
+		("blocos de bytes", contagemDoServidor, nomeDoArquivo, "texto", True),
+		("mmap", contagemDoServidor, nomeDoArquivo, "mmap")
+	]
+	
+	respostas = set()
+	for nome, funcao, *args in medicoes:
+		resposta, tempo, memoria = medirEmProcesso(funcao, *args)
+		respostas.add(resposta)
+		print(f"  {nome:>16}: {tempo:.3f}s, pico de memória {memoria:.0f} MiB")
+	
+	assert len(respostas) == 1, "as camadas de dados discordam"
+	print("  (no mmap, o pico inclui as páginas do arquivo mapeadas, que são do cache do sistema e podem ser descartadas a qualquer momento)")
+
+
+
+# compara a contagem exata com o esboço de memória fixa do modo aproximado, em texto sintético com frequências de Zipf
+def benchmarkAproximado(palavras = 2*10**6, vocabulario = 10**6, expoente = 1.1, k = 100):
+	palavras, vocabulario, expoente, k = int(palavras), int(vocabulario), float(expoente), int(k)
+	
+	# sorteia as palavras com probabilidade proporcional a 1/posto^expoente, e junta em blocos de texto
+	random.seed(0)
+	pesos = list(itertools.accumulate(1/posto**expoente for posto in range(1, vocabulario + 1)))
+	sorteadas = random.choices(range(vocabulario), cum_weights = pesos, k = palavras)
+	blocos = [" ".join(f"palavra{i}" for i in sorteadas[inicio : inicio + 100000]) + " " for inicio in range(0, palavras, 100000)]
+	del sorteadas
+	
+	exata, tempo = cronometrar(server.contarPalavras, blocos)
+	verdadeiras = [palavra for palavra, _ in exata.most_common(k)]
+	print(f"{palavras} palavras, {len(exata)} distintas, Zipf com expoente {expoente}, top-{k}")
+	print(f"  {'exata':>16}: {tempo:.3f}s, {server.tamanhoDaContagem(exata)/(1024*1024):.1f} MiB")
+	
+	for capacidade in (k, 10*k, 100*k, 1000*k):
+		esboco, tempo = cronometrar(server.esbocarPalavras, server.palavrasDosBlocos(blocos), capacidade)
+		itens = esboco.maisFrequentes(k)
+		
+		# acerto: quantas das k verdadeiras o esboço achou; erro: o maior desvio da contagem em relação à real
+		acerto = len({palavra for palavra, _, _ in itens} & set(verdadeiras))/k
+		erro = max(abs(contagem - exata[palavra])/exata[palavra] for palavra, contagem, _ in itens)
+		garantido = max(erroMaximo/contagem for _, contagem, erroMaximo in itens)
+		print(f"  {'esboço de ' + str(capacidade):>16}: {tempo:.3f}s, {server.tamanhoDaContagem(esboco)/(1024*1024):.1f} MiB, "
+			f"acerto do top-{k} {acerto:.0%}, erro relativo máximo {erro:.2%} (garantido {garantido:.2%})")
+
+
+
+# input: o nome do arquivo em bytes
+# output: a contagem das palavras pelo motor do servidor (bytes.split e Counter.update em cada bloco)
+def contagemComDict(nomeDoArquivo):
+	with open(nomeDoArquivo, mode = 'rb') as file:
+		return server.contarPalavrasEmBytes(server.blocos(file))
+
+
+
+# input: o nome do arquivo em bytes
+# output: a mesma contagem, com o NumPy: em cada bloco, o np.unique dá um id inteiro a cada palavra e o np.bincount
+# conta os ids de uma vez, então o laço em Python passa só pelas palavras distintas do bloco
+def contagemComNumpy(nomeDoArquivo):
+	wordDict = Counter()
+	with open(nomeDoArquivo, mode = 'rb') as file:
+		for wordList in server.palavrasDosBlocosEmBytes(server.blocos(file)):
+			if not wordList:
+				continue
+			unicas, ids = numpy.unique(numpy.array(wordList, dtype = bytes), return_inverse = True)
+			contagens = numpy.bincount(ids, minlength = len(unicas))
+			wordDict.update(dict(zip(unicas.tolist(), contagens.tolist())))
+	return wordDict
+
+
+
+# compara a contagem em bytes do servidor (dict) com uma contagem vetorizada no NumPy (ids + bincount) em arquivos de
+# tamanhos crescentes, para ver se o NumPy passa a compensar a partir de algum tamanho
+def benchmarkMotor(*megabytes):
+	if numpy is None:
+		print("o NumPy não está instalado")
+		return
+	
+	caminho = "benchmark.txt"
+	cruzamento = None
+	print("motor da contagem em bytes")
+	for tamanho in map(int, megabytes or (1, 4, 16, 64)):
+		gerarArquivo(caminho, tamanho)
+		nomeDoArquivo = caminho.encode("utf-8")
+		
+		# uma rodada de cada motor antes, para o arquivo estar no cache do sistema e o NumPy já estar carregado
+		contagemComDict(nomeDoArquivo)
+		contagemComNumpy(nomeDoArquivo)
+		contagemDict, tempoDict = cronometrar(contagemComDict, nomeDoArquivo)
+		contagemNumpy, tempoNumpy = cronometrar(contagemComNumpy, nomeDoArquivo)
+		
+		assert contagemNumpy == contagemDict, "os motores discordam"
+		if cruzamento is None and tempoNumpy < tempoDict:
+			cruzamento = tamanho
+		print(f"  {tamanho:>5} MiB: dict {tempoDict:.3f}s, numpy {tempoNumpy:.3f}s ({tempoDict/tempoNumpy:.2f}x)")
+	
+	print(f"  o NumPy passa a ganhar a partir de {cruzamento} MiB" if cruzamento else "  o NumPy não ganhou em nenhum tamanho; o servidor conta só com o dict")
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Main
++---------------
+'''
+if __name__ == "__main__":
+	# uso: python benchmark.py topk [palavras distintas]
+	#      python benchmark.py mmap [MiB] [arquivo]
+	#      python benchmark.py aproximado [palavras] [vocabulário] [expoente] [k]
+	#      python benchmark.py motor [MiB...]
+	benchmarks = {
+		"topk": lambda n = 10**6: benchmarkTopK(int(n)),
+		"mmap": benchmarkMmap,
+		"aproximado": benchmarkAproximado,
+		"motor": benchmarkMotor
+	}
+	
+	nome = sys.argv[1] if 1 < len(sys.argv) else "topk"
+	benchmarks[nome](*sys.argv[2:])
@@ -1,27 +1,253 @@
 import socket
 
+import sys
+
+import json
+
+from threading import Thread
+
 
 
 # Criação do socket
 HOST = 'localhost'
 PORT = 5000
 
+# prefixo que abre uma conexão no protocolo com quadros
+VERSAO_QUADROS = b"\x00WC2"
+
+# resposta, sem quadro, de um servidor com a fila cheia (ela chega antes de o servidor ler o prefixo)
+OCUPADO = "Servidor ocupado".encode("utf-8")
+
 
 
 '''
 +---------------
-| Camada de interface
+| Protocolo com quadros
 +---------------
 '''
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-	# conecta com o servidor
-	s.connect((HOST, PORT))
+# --| ServidorOcupado |-- exceção
+# o servidor recusou a conexão porque a sua fila estava cheia
+class ServidorOcupado(Exception):
+	pass
+
+
+
+# input: um socket e um dict
+# output: None (envia o dict como um quadro: o tamanho em 4 bytes seguido do JSON)
+def enviarJson(conn, mensagem):
+	texto = json.dumps(mensagem, separators = (',', ':')).encode("utf-8")
+	conn.sendall(len(texto).to_bytes(4, byteorder = "little") + texto)
+
+
+
+# input: um arquivo de leitura binária do socket
+# output: o dict do próximo quadro, ou None se o servidor fechou a conexão (levanta ServidorOcupado se o servidor
+# respondeu, sem quadro, que está ocupado)
+def receberJson(leitor):
+	cabecalho = leitor.read(4)
+	if len(cabecalho) < 4:
+		return None
+	if cabecalho == OCUPADO[:4]:
+		raise ServidorOcupado()
+	
+	tamanho = int.from_bytes(cabecalho, byteorder = "little")
+	return json.loads(leitor.read(tamanho))
+
+
+
+# input: um arquivo de leitura binária do socket
+# output: o dict do próximo quadro de resposta, ou None se o servidor fechou a conexão
+# (os quadros de progresso que chegarem antes são exibidos na saída de erro)
+def receberResposta(leitor):
+	while True:
+		mensagem = receberJson(leitor)
+		if mensagem is None or "progresso" not in mensagem:
+			return mensagem
+		print(f'{mensagem["id"]}: {mensagem["progresso"]["feitos"]}/{mensagem["progresso"]["total"]} arquivos', file = sys.stderr)
+
+
+
+# input: um socket já no protocolo com quadros, um dict de id para nome de arquivo e as opções dos pedidos
+# output: None (envia todos os pedidos sem esperar as respostas)
+def enviarLote(conn, arquivos, opcoes):
+	try:
+		for id, arquivo in list(arquivos.items()):
+			enviarJson(conn, {"id": id, "arquivo": arquivo, **opcoes})
+		
+		# avisa o servidor que não há mais pedidos
+		conn.shutdown(socket.SHUT_WR)
+	except OSError:
+		# o servidor fechou a conexão (limite de pedidos); o que faltou vai na próxima
+		pass
+
+
+
+# input: None
+# output: uma dupla (S, L) onde S é um socket novo no protocolo com quadros e L é o seu arquivo de leitura
+def conectarComQuadros():
+	conn = socket.create_connection((HOST, PORT))
+	conn.sendall(VERSAO_QUADROS)
+	return (conn, conn.makefile("rb"))
+
+
+
+# input: a lista de nomes de arquivo e as opções dos pedidos
+# output: None (envia todos os pedidos numa só conexão e exibe as respostas à medida que chegam; se o servidor
+# fechar a conexão antes de responder tudo, reenvia o que faltou numa nova)
+def sessaoEmLote(arquivos, opcoes):
+	faltando = dict(enumerate(arquivos))
 	
-	# envia o nome do arquivo lido no terminal
-	s.sendall(input().encode("utf-8"))
+	while faltando:
+		conn, leitor = conectarComQuadros()
+		with conn, leitor:
+			# envia os pedidos numa thread enquanto recebe as respostas nesta
+			envio = Thread(target = enviarLote, args = (conn, faltando, opcoes))
+			envio.daemon = True
+			envio.start()
+			
+			# exibe cada resposta assim que ela chega
+			respondidos = 0
+			while True:
+				try:
+					resposta = receberResposta(leitor)
+				except OSError:
+					resposta = None
+				if resposta is None:
+					break
+				nome = faltando.pop(resposta["id"], "?") if isinstance(resposta["id"], int) else "?"
+				print(nome + ": " + resposta["resposta"])
+				respondidos += 1
+			envio.join()
+		
+		# o servidor fechou sem responder nada: não adianta insistir
+		if respondidos == 0:
+			break
+
+
+
+# input: as opções dos pedidos
+# output: None (mantém uma só conexão aberta e envia cada nome lido no terminal como um pedido,
+# reconectando se o servidor fechou a conexão por ociosidade ou por limite de pedidos)
+def sessaoPersistente(opcoes):
+	conn, leitor = conectarComQuadros()
+	try:
+		for id, linha in enumerate(sys.stdin):
+			pedido = {"id": id, "arquivo": linha.rstrip("\n"), **opcoes}
+			
+			# tenta na conexão atual e, se ela caiu, numa nova
+			for tentativa in range(2):
+				try:
+					enviarJson(conn, pedido)
+					resposta = receberResposta(leitor)
+				except OSError:
+					resposta = None
+				if resposta is not None:
+					break
+				leitor.close()
+				conn.close()
+				conn, leitor = conectarComQuadros()
+			
+			print(resposta["resposta"] if resposta is not None else "Servidor fechou a conexão", flush = True)
+	finally:
+		leitor.close()
+		conn.close()
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Camada de interface
++---------------
+'''
+# uso: python client.py [--lote | --manter | --estatisticas | --corpus] [--aproximado [capacidade] | --palindromo] [k]
+# sem opção, envia o nome de arquivo lido no terminal; com --lote, envia todos os nomes da entrada (um por linha)
+# numa só conexão e exibe as respostas à medida que chegam; com --manter, envia um nome por vez, esperando cada
+# resposta, sempre na mesma conexão; com --aproximado, o servidor conta com memória fixa e responde cada palavra
+# com o intervalo da sua contagem (palavra:mínimo-máximo); com --estatisticas, exibe as métricas do servidor; com --corpus,
+# pede as palavras mais frequentes de todos os arquivos da entrada juntos (um nome por linha, ou uma linha só com um
+# padrão como textos/**/*.txt), exibindo o progresso enquanto o servidor conta; com --palindromo, pede o maior
+# palíndromo do texto de cada arquivo em vez das palavras mais frequentes
+args = sys.argv[1:]
+lote = "--lote" in args
+if lote:
+	args.remove("--lote")
+manter = "--manter" in args
+if manter:
+	args.remove("--manter")
+estatisticas = "--estatisticas" in args
+if estatisticas:
+	args.remove("--estatisticas")
+corpus = "--corpus" in args
+if corpus:
+	args.remove("--corpus")
+palindromo = "--palindromo" in args
+if palindromo:
+	args.remove("--palindromo")
+
+# opções dos pedidos: quantas palavras pedir ao servidor e se a contagem pode ser aproximada
+opcoes = {}
+if "--aproximado" in args:
+	posicao = args.index("--aproximado")
+	opcoes["modo"] = "aproximado"
+	del args[posicao]
 	
-	# recebe as 5 palavras mais frequentes em forma de bytes
-	data = s.recv(1024)
+	# a capacidade vem logo depois, se houver dois números
+	if posicao < len(args) - 1:
+		opcoes["capacidade"] = int(args.pop(posicao))
+if args:
+	opcoes["k"] = int(args[0])
+if palindromo:
+	opcoes = {"tipo": "palindromo"}
 
-# exibe as 5 palavras mais frequentes
-print(data.decode("utf-8"))
\ No newline at end of file
+# o servidor pode recusar a conexão com a fila cheia
+try:
+	if estatisticas:
+		# pede as estatísticas do servidor em vez de uma contagem
+		with socket.create_connection((HOST, PORT)) as s:
+			s.sendall(b"\ntipo=estatisticas")
+			print(s.makefile("rb").read().decode("utf-8"))
+	elif corpus:
+		# um pedido só, com todos os arquivos, numa conexão com quadros (para receber o progresso)
+		nomes = [linha.rstrip("\n") for linha in sys.stdin if linha.strip()]
+		pedido = {"id": 0, "tipo": "corpus", **opcoes}
+		if len(nomes) == 1:
+			pedido["padrao"] = nomes[0]
+		else:
+			pedido["arquivos"] = nomes
+		
+		conn, leitor = conectarComQuadros()
+		with conn, leitor:
+			enviarJson(conn, pedido)
+			resposta = receberResposta(leitor)
+		print(resposta["resposta"] if resposta is not None else "Servidor fechou a conexão")
+	elif manter:
+		sessaoPersistente(opcoes)
+	elif lote:
+		sessaoEmLote([linha.rstrip("\n") for linha in sys.stdin if linha.strip()], opcoes)
+	else:
+		with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+			# conecta com o servidor
+			s.connect((HOST, PORT))
+			
+			# envia o nome do arquivo lido no terminal, e as opções escolhidas, uma por linha
+			pedido = input()
+			for chave, valor in opcoes.items():
+				pedido += f"\n{chave}={valor}"
+			s.sendall(pedido.encode("utf-8"))
+			
+			# recebe as palavras mais frequentes em forma de bytes, até o servidor fechar a conexão
+			partes = []
+			while True:
+				data = s.recv(4096)
+				if not data:
+					break
+				partes.append(data)
+			
+			# exibe as palavras mais frequentes
+			print(b"".join(partes).decode("utf-8"))
+except ServidorOcupado:
+	print("Servidor ocupado")
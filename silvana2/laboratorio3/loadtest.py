@@ -0,0 +1,219 @@
+import socket
+
+import sys
+
+import json
+
+import time
+
+import random
+
+import argparse
+
+from threading import Thread, Lock
+
+
+
+# respostas do servidor que indicam erro
+RESPOSTAS_DE_ERRO = {
+	"Arquivo não encontrado": "naoEncontrado",
+	"Pedido inválido": "pedidoInvalido",
+	"Erro ao ler o arquivo": "erroDeLeitura",
+	"Servidor ocupado": "ocupado"
+}
+
+
+
+'''
++---------------
+| Cliente
++---------------
+'''
+# input: o endereço do servidor, o nome do arquivo e o tempo limite em segundos
+# output: a resposta do servidor em str (faz o mesmo que o client.py: conecta, envia o nome e lê até o servidor fechar)
+def pedir(host, port, arquivo, tempoLimite):
+	with socket.create_connection((host, port), timeout = tempoLimite) as s:
+		s.sendall(arquivo.encode("utf-8"))
+		
+		partes = []
+		while True:
+			data = s.recv(4096)
+			if not data:
+				break
+			partes.append(data)
+	
+	return b"".join(partes).decode("utf-8")
+
+
+
+# --| Resultados |-- classe
+# acumula as latências e os erros de todos os clientes
+class Resultados:
+	def __init__(self):
+		self.latencias = []
+		self.erros = {}
+		self.lock = Lock()
+	
+	
+	
+	# input: a latência do pedido em segundos e o tipo do erro (None se deu certo)
+	# output: None
+	def registrar(self, latencia, erro):
+		with self.lock:
+			if erro is None:
+				self.latencias.append(latencia)
+			else:
+				self.erros[erro] = self.erros.get(erro, 0) + 1
+
+
+
+# laço de cada cliente: faz pedidos até o prazo acabar ou até completar a sua cota
+def clienteMain(args, arquivos, pesos, prazo, resultados, semente):
+	sorteio = random.Random(semente)
+	feitos = 0
+	
+	while time.perf_counter() < prazo and (args.pedidos == 0 or feitos < args.pedidos):
+		arquivo = sorteio.choices(arquivos, pesos)[0]
+		inicio = time.perf_counter()
+		
+		try:
+			resposta = pedir(args.host, args.port, arquivo, args.tempo_limite)
+			erro = RESPOSTAS_DE_ERRO.get(resposta.strip())
+		except socket.timeout:
+			erro = "tempoEsgotado"
+		except OSError:
+			erro = "conexao"
+		
+		resultados.registrar(time.perf_counter() - inicio, erro)
+		feitos += 1
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Relatório
++---------------
+'''
+# input: uma lista ordenada de latências e um percentil entre 0 e 100
+# output: a latência do percentil (pelo posto mais próximo), ou None se a lista estiver vazia
+def percentil(latencias, p):
+	if not latencias:
+		return None
+	return latencias[min(len(latencias) - 1, max(0, -(-len(latencias)*p//100) - 1))]
+
+
+
+# input: os resultados, a duração real do teste e os argumentos
+# output: um dict com o resumo do teste, pronto para virar JSON
+def resumir(resultados, duracao, args):
+	latencias = sorted(resultados.latencias)
+	erros = sum(resultados.erros.values())
+	milissegundos = lambda x: None if x is None else round(x*1000, 3)
+	
+	return {
+		"servidor": f"{args.host}:{args.port}",
+		"clientes": args.clientes,
+		"arquivos": args.arquivos,
+		"duracao": round(duracao, 3),
+		"pedidos": len(latencias) + erros,
+		"sucessos": len(latencias),
+		"erros": erros,
+		"errosPorTipo": resultados.erros,
+		"vazao": round(len(latencias)/duracao, 3) if 0 < duracao else 0.0,
+		"latenciaMs": {
+			"media": milissegundos(sum(latencias)/len(latencias)) if latencias else None,
+			"p50": milissegundos(percentil(latencias, 50)),
+			"p95": milissegundos(percentil(latencias, 95)),
+			"p99": milissegundos(percentil(latencias, 99)),
+			"max": milissegundos(latencias[-1]) if latencias else None
+		}
+	}
+
+
+
+# input: o resumo atual, o resumo de referência e a tolerância (0.1 = 10%)
+# output: uma lista de regressões encontradas, em texto
+def compararComReferencia(resumo, referencia, tolerancia):
+	regressoes = []
+	
+	if resumo["vazao"] < referencia["vazao"]*(1 - tolerancia):
+		regressoes.append(f'vazão caiu de {referencia["vazao"]} para {resumo["vazao"]} pedidos/s')
+	
+	for p in ("p50", "p95", "p99"):
+		atual = resumo["latenciaMs"][p]
+		antes = referencia["latenciaMs"][p]
+		if atual is not None and antes is not None and antes*(1 + tolerancia) < atual:
+			regressoes.append(f"latência {p} subiu de {antes} para {atual} ms")
+	
+	if referencia["erros"] < resumo["erros"]:
+		regressoes.append(f'erros subiram de {referencia["erros"]} para {resumo["erros"]}')
+	
+	return regressoes
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Main
++---------------
+'''
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Gerador de carga para os servidores de contagem de palavras.")
+	parser.add_argument("arquivos", nargs = "+", help = "arquivos pedidos, no formato nome ou nome:peso")
+	parser.add_argument("--host", default = "localhost")
+	parser.add_argument("--port", type = int, default = 5000)
+	parser.add_argument("--clientes", type = int, default = 16, help = "clientes simultâneos")
+	parser.add_argument("--duracao", type = float, default = 10.0, help = "duração do teste em segundos")
+	parser.add_argument("--pedidos", type = int, default = 0, help = "pedidos por cliente (0 = até a duração acabar)")
+	parser.add_argument("--tempo-limite", type = float, default = 30.0, help = "tempo limite de cada pedido em segundos")
+	parser.add_argument("--saida", help = "arquivo JSON onde salvar o resultado")
+	parser.add_argument("--referencia", help = "resultado JSON anterior para comparar")
+	parser.add_argument("--tolerancia", type = float, default = 0.1, help = "piora tolerada em relação à referência")
+	args = parser.parse_args()
+	
+	# separa os nomes dos pesos
+	arquivos = []
+	pesos = []
+	for item in args.arquivos:
+		nome, separador, peso = item.rpartition(":")
+		if separador and peso.replace(".", "", 1).isdigit():
+			arquivos.append(nome)
+			pesos.append(float(peso))
+		else:
+			arquivos.append(item)
+			pesos.append(1.0)
+	
+	# dispara os clientes
+	resultados = Resultados()
+	inicio = time.perf_counter()
+	prazo = inicio + args.duracao
+	clientes = [Thread(target = clienteMain, args = (args, arquivos, pesos, prazo, resultados, i)) for i in range(args.clientes)]
+	for cliente in clientes:
+		cliente.start()
+	for cliente in clientes:
+		cliente.join()
+	
+	resumo = resumir(resultados, time.perf_counter() - inicio, args)
+	texto = json.dumps(resumo, indent = "\t", ensure_ascii = False)
+	print(texto)
+	
+	if args.saida:
+		with open(args.saida, mode = 'w') as file:
+			file.write(texto + "\n")
+	
+	# compara com a referência e termina com erro se houve regressão
+	if args.referencia:
+		with open(args.referencia) as file:
+			regressoes = compararComReferencia(resumo, json.load(file), args.tolerancia)
+		
+		for regressao in regressoes:
+			print("Regressão: " + regressao, file = sys.stderr)
+		sys.exit(1 if regressoes else 0)
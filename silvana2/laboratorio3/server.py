@@ -2,75 +2,1820 @@ import socket
 
 import select
 
-from threading import Thread
+import os
+
+import sys
+
+import json
+
+import re
+
+import codecs
+
+import mmap
+
+import multiprocessing
+
+import asyncio
+
+import queue
+
+import time
+
+import signal
+
+import math
+
+import threading
+
+import glob
+
+import itertools
+
+from longest_palindrome_substring import longestPalindrome
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, TimeoutError as FuturoAtrasado
+
+from threading import Thread, Lock
+
+from collections import Counter, OrderedDict
+
+import heapq
+
+from operator import itemgetter
+
+import io
+
+import gzip
+
+import zlib
+
+# bz2 e lzma dependem de bibliotecas que nem toda instalação do Python tem
+try:
+	import bz2
+except ImportError:
+	bz2 = None
+
+try:
+	import lzma
+except ImportError:
+	lzma = None
+
+
+
+# tamanho, em caracteres, de cada bloco lido do arquivo
+TAMANHO_DO_BLOCO = 1024*1024
+
+# quantas palavras são retornadas quando o cliente não escolhe
+K_PADRAO = 5
+
+# prefixo que o cliente envia ao abrir uma conexão no protocolo com quadros (nenhum nome de arquivo começa com o byte nulo)
+VERSAO_QUADROS = b"\x00WC2"
+
+# tamanho máximo, em bytes, de um quadro recebido
+MAX_QUADRO = 16*1024*1024
+
+
+
+'''
++---------------
+| Configuração
++---------------
+'''
+# valores padrão; o arquivo serverConfig.json, quando existe, sobrescreve qualquer um deles
+config = {
+	"host": "localhost",
+	"port": 5000,
+	"cacheMaxEntradas": 128,
+	"cacheMaxBytes": 256*1024*1024,
+	"limiarParalelo": 64*1024*1024,	# arquivos a partir deste tamanho, em bytes, são contados em vários processos
+	"processosDeContagem": 0,	# 0 usa um processo por núcleo
+	"camadaDeDados": "texto",	# "texto" (lê o arquivo em blocos) ou "mmap" (conta direto nos bytes mapeados na memória)
+	"contagemEmBytes": True,	# conta as palavras nos bytes do arquivo, sem decodificar, quando a codificação permite
+	"contagemIncremental": True,	# reaproveita a contagem de um arquivo que só cresceu desde então, contando só o que foi acrescentado
+	"maxArquivosDoCorpus": 10000,	# arquivos que um pedido de corpus pode juntar (pela lista ou pelo padrão)
+	"intervaloDeProgresso": 0.5,	# no protocolo com quadros, segundos entre dois avisos de progresso de um pedido de corpus
+	"processosDePalindromo": 1,	# processos que calculam os palíndromos, separados dos da contagem
+	"maxTamanhoDoPalindromo": 1024*1024,	# tamanho máximo, em bytes, do arquivo de um pedido de palíndromo
+	"prazoDoPalindromo": 10,	# segundos que um pedido de palíndromo pode levar (o pedido pode escolher um prazo menor)
+	"capacidadeDoEsboco": 10000,	# no modo aproximado, quantas palavras o esboço acompanha quando o pedido não escolhe
+	"maxCapacidadeDoEsboco": 100000,	# no modo aproximado, a maior capacidade que um pedido pode escolher (limita a memória de cada esboço)
+	"modo": "select",	# "select" (um pool de threads atende as conexões) ou "asyncio" (um laço de eventos para todas as conexões)
+	"processosDoServidor": 1,	# acima de 1, abre essa quantidade de processos no modo select, todos na mesma porta (SO_REUSEPORT)
+	"maxConexoes": 10000,	# no modo asyncio, conexões atendidas ao mesmo tempo; as outras esperam a vez
+	"trabalhadores": 8,	# threads que atendem as conexões (select) ou fazem a contagem fora do laço de eventos (asyncio)
+	"profundidadeDaFila": 64,	# no modo select, conexões aceitas esperando um trabalhador; além disso, o servidor responde que está ocupado
+	"maxPedidosPendentes": 64,	# no protocolo com quadros, pedidos de uma conexão sendo processados ao mesmo tempo
+	"tempoOcioso": 30,	# no protocolo com quadros, segundos sem pedidos (e sem respostas pendentes) até o servidor fechar a conexão
+	"maxPedidosPorConexao": 1000,	# no protocolo com quadros, pedidos atendidos numa conexão antes de o servidor fechá-la
+	"backlog": 128,	# conexões pendentes que o sistema operacional segura antes do accept
+	"diretorioDeAquecimento": None,	# diretório cujos arquivos são todos contados ao iniciar o servidor (None desliga o aquecimento)
+	"concorrenciaDoAquecimento": 2,	# arquivos contados ao mesmo tempo durante o aquecimento
+	"arquivoDeMetricas": None,	# arquivo JSONL onde as estatísticas são gravadas periodicamente (None desliga)
+	"intervaloDeMetricas": 60	# segundos entre duas gravações das estatísticas
+}
+
+
+
+# input: o caminho do arquivo de configuração
+# output: None (atualiza o dict config com os valores do arquivo, se ele existir)
+def carregarConfig(caminho):
+	try:
+		with open(caminho) as file:
+			config.update(json.load(file))
+	except FileNotFoundError:
+		pass
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Métricas
++---------------
+'''
+# --| Histograma |-- classe
+# distribuição de valores positivos em faixas de potências de 2, com memória constante
+class Histograma:
+	def __init__(self):
+		self.faixas = {}	# expoente -> quantos valores caíram em [2^(e-1), 2^e)
+		self.quantidade = 0
+		self.soma = 0
+		self.maximo = 0
+		self.lock = Lock()
+	
+	
+	
+	# input: um valor
+	# output: None
+	def registrar(self, valor):
+		expoente = math.frexp(valor)[1] if 0 < valor else -1075	# -1075 fica abaixo de qualquer float positivo
+		
+		with self.lock:
+			self.faixas[expoente] = self.faixas.get(expoente, 0) + 1
+			self.quantidade += 1
+			self.soma += valor
+			self.maximo = max(self.maximo, valor)
+	
+	
+	
+	# input: um percentil entre 0 e 100 (o lock já deve estar adquirido)
+	# output: o limite superior da faixa onde está o percentil (no máximo o maior valor visto)
+	def percentil(self, p):
+		posto = max(1, math.ceil(self.quantidade*p/100))
+		acumulado = 0
+		for expoente in sorted(self.faixas):
+			acumulado += self.faixas[expoente]
+			if posto <= acumulado:
+				return min(math.ldexp(1, expoente), self.maximo)
+		return self.maximo
+	
+	
+	
+	# input: None
+	# output: um dict com a quantidade, a média, o máximo e os percentis aproximados
+	def resumo(self):
+		with self.lock:
+			if self.quantidade == 0:
+				return {"quantidade": 0}
+			return {
+				"quantidade": self.quantidade,
+				"media": self.soma/self.quantidade,
+				"p50": self.percentil(50),
+				"p95": self.percentil(95),
+				"p99": self.percentil(99),
+				"maximo": self.maximo,
+				"total": self.soma
+			}
+
+
+
+# --| Metricas |-- classe
+# tempos por camada (dados, processamento e rede, em segundos) e volumes por pedido (bytes lidos, palavras contadas
+# e bytes enviados); o tempo de dados alto indica um gargalo de E/S, o de processamento, de CPU
+class Metricas:
+	def __init__(self):
+		self.histogramas = {nome: Histograma() for nome in ("dados", "processamento", "rede", "bytesLidos", "palavras", "bytesEnviados")}
+		self.inicio = time.time()
+	
+	
+	
+	# input: a medição de um pedido e o tempo total dele em segundos
+	# output: None
+	def registrarPedido(self, medicao, tempoTotal):
+		self.histogramas["dados"].registrar(medicao.dados)
+		self.histogramas["processamento"].registrar(max(0.0, tempoTotal - medicao.dados))
+		self.histogramas["bytesLidos"].registrar(medicao.bytesLidos)
+		self.histogramas["palavras"].registrar(medicao.palavras)
+	
+	
+	
+	# input: o tempo de um envio em segundos e quantos bytes foram enviados
+	# output: None
+	def registrarEnvio(self, tempo, quantidade):
+		self.histogramas["rede"].registrar(tempo)
+		self.histogramas["bytesEnviados"].registrar(quantidade)
+	
+	
+	
+	# input: None
+	# output: um dict com o resumo de cada histograma
+	def estatisticas(self):
+		resumo = {nome: histograma.resumo() for nome, histograma in self.histogramas.items()}
+		resumo["desde"] = self.inicio
+		return resumo
+
+
+
+metricas = Metricas()
+
+
+
+# --| Medicao |-- classe
+# o que um pedido gastou e leu, acumulado pelas camadas na thread que atende o pedido
+class Medicao:
+	def __init__(self):
+		self.dados = 0.0	# segundos abrindo e lendo o arquivo
+		self.bytesLidos = 0
+		self.palavras = 0
+
+
+
+medicoes = threading.local()
+
+
+
+# input: None
+# output: a medição do pedido sendo atendido nesta thread
+def medicaoAtual():
+	if not hasattr(medicoes, "atual"):
+		medicoes.atual = Medicao()
+	return medicoes.atual
+
+
+
+# input: um iterável de blocos
+# output: os mesmos blocos, somando o tempo gasto para obter cada um ao tempo de dados do pedido
+def medirLeitura(blocos):
+	medicao = medicaoAtual()
+	iterador = iter(blocos)
+	
+	while True:
+		inicio = time.perf_counter()
+		bloco = next(iterador, None)
+		medicao.dados += time.perf_counter() - inicio
+		
+		if bloco is None:
+			return
+		yield bloco
+
+
+
+# input: um socket e os bytes a enviar
+# output: None (envia tudo e registra o tempo de rede)
+def enviarMedindo(conn, resposta):
+	inicio = time.perf_counter()
+	conn.sendall(resposta)
+	metricas.registrarEnvio(time.perf_counter() - inicio, len(resposta))
+
+
+
+# input: o caminho do arquivo JSONL e o intervalo em segundos
+# output: None (grava as estatísticas do servidor no arquivo, uma linha por intervalo, até o programa terminar)
+def gravarMetricas(caminho, intervalo):
+	while True:
+		time.sleep(intervalo)
+		linha = json.dumps({"tempo": time.time(), "pid": os.getpid(), **estatisticasDoServidor()})
+		with open(caminho, mode = 'a') as file:
+			file.write(linha + "\n")
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Camada de dados
++---------------
+'''
+# input: nome do arquivo em bytes
+# output: uma dupla (A, E) onde A é o arquivo aberto para leitura e E é verdadeiro sse o arquivo existe
+def dados(nomeDoArquivo):
+	name = bytes(nomeDoArquivo).decode("utf-8")	# pega o nome do arquivo em formato str
+	
+	# tenta abrir o arquivo
+	try:
+		# arquivo encontrado, retorna o arquivo aberto e um sinal de que o arquivo foi encontrado
+		return (open(name, mode = 'r'), True)
+	except (FileNotFoundError, ValueError):
+		# arquivo não encontrado (ou um nome que não pode ser de arquivo, como um com byte nulo), então retorna um sinal falso
+		return (None, False)
+
+
+
+# input: um arquivo aberto para leitura e o tamanho de cada bloco
+# output: um gerador que lê o arquivo bloco a bloco, sem nunca carregar o arquivo inteiro na memória
+def blocos(file, tamanho = TAMANHO_DO_BLOCO):
+	while True:
+		bloco = file.read(tamanho)
+		
+		# fim do arquivo
+		if not bloco:
+			return
+		
+		yield bloco
+
+
+
+# bytes de espaço em branco que nunca aparecem no meio de um caractere numa codificação compatível com ASCII
+ESPACO_ASCII = re.compile(rb"[\t-\r\x1c-\x20]")
+
+
+
+# input: o nome de uma codificação
+# output: verdadeiro sse os bytes ASCII de espaço só representam espaços nela (como no UTF-8 e no Latin-1)
+def compativelComAscii(codificacao):
+	nome = codecs.lookup(codificacao).name
+	return nome in ("utf-8", "ascii", "latin-1") or nome.startswith(("iso8859", "cp125"))
+
+
+
+# input: um arquivo aberto em modo binário, uma posição e o tamanho do arquivo
+# output: a primeira posição, a partir da dada, logo depois de um espaço (ou o fim do arquivo)
+def alinharNoEspaco(file, posicao, tamanhoDoArquivo):
+	# se o byte anterior já é espaço, a posição já está alinhada
+	if posicao == 0:
+		return 0
+	file.seek(posicao - 1)
+	
+	while posicao <= tamanhoDoArquivo:
+		janela = file.read(64*1024)
+		if not janela:
+			break
+		
+		encontrado = ESPACO_ASCII.search(janela)
+		if encontrado:
+			return posicao + encontrado.start()
+		posicao += len(janela)
+	
+	return tamanhoDoArquivo
+
+
+
+# input: um arquivo aberto em modo binário, o tamanho do arquivo e em quantas partes dividi-lo
+# output: uma lista de faixas (início, fim) de bytes que cobrem o arquivo, cada uma terminando logo depois de um espaço
+def faixasDoArquivo(file, tamanhoDoArquivo, partes):
+	limites = [0]
+	for i in range(1, partes):
+		limite = alinharNoEspaco(file, max(i*tamanhoDoArquivo//partes, limites[-1]), tamanhoDoArquivo)
+		if limites[-1] < limite < tamanhoDoArquivo:
+			limites.append(limite)
+	limites.append(tamanhoDoArquivo)
+	
+	return list(zip(limites, limites[1:]))
+
+
+
+# input: um arquivo aberto em modo binário, uma faixa de bytes e o tamanho de cada bloco
+# output: um gerador dos blocos de bytes da faixa, sem decodificar
+def blocosBrutosDaFaixa(file, inicio, fim, tamanho = TAMANHO_DO_BLOCO):
+	file.seek(inicio)
+	restante = fim - inicio
+	
+	while 0 < restante:
+		dado = file.read(min(tamanho, restante))
+		
+		# o arquivo diminuiu
+		if not dado:
+			break
+		
+		restante -= len(dado)
+		yield dado
+
+
+
+# input: um arquivo aberto em modo binário, uma faixa de bytes, a codificação do texto e o tamanho de cada bloco
+# output: um gerador dos blocos de texto da faixa
+def blocosDaFaixa(file, inicio, fim, codificacao, tamanho = TAMANHO_DO_BLOCO):
+	decodificador = codecs.getincrementaldecoder(codificacao)()
+	
+	for dado in blocosBrutosDaFaixa(file, inicio, fim, tamanho):
+		yield decodificador.decode(dado)
+	
+	yield decodificador.decode(b"", final = True)
+
+
+
+# input: um arquivo aberto, o tamanho dele em bytes e o tamanho de cada bloco
+# output: um gerador de blocos de bytes tirados do arquivo mapeado na memória, sem decodificar nada
+# (só o bloco da vez é copiado; o resto fica no cache de páginas do sistema operacional)
+def blocosMapeados(file, tamanhoDoArquivo, tamanho = TAMANHO_DO_BLOCO):
+	# um arquivo vazio não pode ser mapeado
+	if tamanhoDoArquivo == 0:
+		return
+	
+	with mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as mapa:
+		for inicio in range(0, len(mapa), tamanho):
+			yield mapa[inicio : inicio + tamanho]
+
+
+
+# assinaturas (magic bytes) dos formatos compactados -> como abrir o fluxo descompactado a partir do arquivo binário;
+# o "BZh" sozinho aparece no começo de textos comuns, então a do bz2 inclui o tamanho do bloco (1 a 9) e a marca do
+# primeiro bloco (ou a do fim do fluxo, num arquivo compactado vazio)
+COMPRESSOES = {re.compile(rb"\x1f\x8b"): ("gzip", lambda arquivo: gzip.GzipFile(fileobj = arquivo, mode = 'rb'))}
+if bz2 is not None:
+	COMPRESSOES[re.compile(rb"BZh[1-9](1AY&SY|\x17rE8P\x90)")] = ("bz2", bz2.BZ2File)
+if lzma is not None:
+	COMPRESSOES[re.compile(rb"\xfd7zXZ\x00")] = ("xz", lzma.LZMAFile)
+
+# erros de um arquivo compactado corrompido que não são OSError
+ERROS_DE_DESCOMPACTACAO = (EOFError, zlib.error) + ((lzma.LZMAError,) if lzma is not None else ())
+
+
+
+# input: um arquivo aberto
+# output: o nome do formato de compressão do arquivo ("gzip", "bz2" ou "xz"), pelos primeiros bytes, ou None se não é compactado
+def compressaoDoArquivo(file):
+	inicio = file.buffer.peek(10)[:10]	# peek não avança a posição de leitura
+	for assinatura, (nome, _) in COMPRESSOES.items():
+		if assinatura.match(inicio):
+			return nome
+	return None
+
+
+
+# input: um arquivo aberto e o nome do formato de compressão dele
+# output: um arquivo binário com o conteúdo descompactado, lido sob demanda (fechá-lo não fecha o arquivo original)
+def abrirDescompactado(file, compressao):
+	file.buffer.seek(0)
+	for nome, abrir in COMPRESSOES.values():
+		if nome == compressao:
+			return abrir(file.buffer)
+
+
+
+# input: um arquivo aberto
+# output: a identidade do arquivo (dispositivo, inode, tamanho e data de modificação), que muda sempre que o arquivo muda
+def identidade(file):
+	estado = os.fstat(file.fileno())
+	return (estado.st_dev, estado.st_ino, estado.st_size, estado.st_mtime_ns)
+
+
+
+# quantos bytes antes do fim contado são guardados (pela assinatura) para conferir que o arquivo só cresceu
+JANELA_DE_RETOMADA = 4096
+
+
+
+# input: um arquivo aberto em modo binário e uma posição
+# output: os bytes logo antes da posição (até JANELA_DE_RETOMADA deles), ou None se o arquivo agora é menor que isso
+def janelaAntesDe(file, posicao):
+	inicio = max(0, posicao - JANELA_DE_RETOMADA)
+	file.seek(inicio)
+	janela = file.read(posicao - inicio)
+	return janela if len(janela) == posicao - inicio else None
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Cache
++---------------
+'''
+# input: um dict com o número de ocorrências de cada palavra
+# output: uma estimativa de quantos bytes o dict ocupa na memória
+def tamanhoDaContagem(wordDict):
+	if isinstance(wordDict, EsbocoDeFrequencias):
+		return tamanhoDaContagem(wordDict.contadores) + sys.getsizeof(wordDict.heap) + 120*len(wordDict.heap)
+	return sys.getsizeof(wordDict) + sum(map(sys.getsizeof, wordDict)) + 32*len(wordDict)
+
+
+
+# --| CacheDeContagens |-- classe
+# guarda a contagem de palavras dos arquivos pedidos recentemente, descartando o menos usado (LRU) quando o orçamento estoura
+# cada entrada é indexada pelo caminho do arquivo (com a compressão e a capacidade do esboço) e só vale enquanto
+# a identidade do arquivo não mudar; uma entrada com ponto de retomada continua guardada se o arquivo só cresceu,
+# para a próxima contagem partir dela
+class CacheDeContagens:
+	def __init__(self, maxEntradas, maxBytes):
+		self.maxEntradas = maxEntradas
+		self.maxBytes = maxBytes
+		
+		# caminho -> (identidade, contagem, bytes, ponto de retomada), do menos para o mais usado recentemente
+		self.entradas = OrderedDict()
+		self.bytes = 0
+		
+		# contadores
+		self.acertos = 0
+		self.falhas = 0
+		self.despejos = 0
+		self.invalidacoes = 0
+		self.retomadas = 0
+		
+		# exclusão mútua
+		self.lock = Lock()
+	
+	
+	
+	# input: o caminho e a identidade atual do arquivo
+	# output: a contagem guardada, ou None se não houver uma contagem válida
+	def obter(self, caminho, identidadeAtual):
+		with self.lock:
+			entrada = self.entradas.get(caminho)
+			
+			# acerto: o arquivo não mudou desde a contagem
+			if entrada is not None and entrada[0] == identidadeAtual:
+				self.entradas.move_to_end(caminho)
+				self.acertos += 1
+				return entrada[1]
+			
+			# falha; se o arquivo mudou (e não só cresceu), a entrada antiga não serve mais
+			self.falhas += 1
+			if entrada is not None and not self.podeRetomar(entrada, identidadeAtual):
+				self.remover(caminho)
+				self.invalidacoes += 1
+			
+			return None
+	
+	
+	
+	# input: o caminho e a identidade atual do arquivo
+	# output: uma dupla (C, R) com a contagem guardada e o seu ponto de retomada, se o arquivo só cresceu desde ela,
+	# ou None
+	def retomavel(self, caminho, identidadeAtual):
+		with self.lock:
+			entrada = self.entradas.get(caminho)
+			if entrada is None or not self.podeRetomar(entrada, identidadeAtual):
+				return None
+			
+			self.retomadas += 1
+			return (entrada[1], entrada[3])
+	
+	
+	
+	# input: uma entrada e a identidade atual do arquivo dela
+	# output: verdadeiro sse a entrada tem ponto de retomada e o arquivo é o mesmo (dispositivo e inode) e está maior;
+	# um arquivo truncado ou trocado na rotação de logs não pode ser retomado
+	@staticmethod
+	def podeRetomar(entrada, identidadeAtual):
+		identidadeAnterior, _, _, retomada = entrada
+		return retomada is not None and identidadeAnterior[:2] == identidadeAtual[:2] and identidadeAnterior[2] < identidadeAtual[2]
+	
+	
+	
+	# input: o caminho, a identidade do arquivo, a contagem das palavras e o ponto de retomada dela (None se a contagem
+	# não pode ser continuada)
+	# output: None
+	def guardar(self, caminho, identidadeAtual, wordDict, retomada = None):
+		tamanho = tamanhoDaContagem(wordDict)
+		
+		# uma contagem maior que o orçamento inteiro nunca é guardada
+		if self.maxEntradas < 1 or self.maxBytes < tamanho:
+			return
+		
+		with self.lock:
+			if caminho in self.entradas:
+				self.remover(caminho)
+			
+			self.entradas[caminho] = (identidadeAtual, wordDict, tamanho, retomada)
+			self.bytes += tamanho
+			
+			# descarta as entradas menos usadas até caber no orçamento
+			while self.maxEntradas < len(self.entradas) or self.maxBytes < self.bytes:
+				_, (_, _, tamanhoDescartado, _) = self.entradas.popitem(last = False)
+				self.bytes -= tamanhoDescartado
+				self.despejos += 1
+	
+	
+	
+	# input: o caminho de uma entrada (o lock já deve estar adquirido)
+	# output: None
+	def remover(self, caminho):
+		_, _, tamanho, _ = self.entradas.pop(caminho)
+		self.bytes -= tamanho
+	
+	
+	
+	# input: None
+	# output: um dict com o uso e os contadores do cache
+	def estatisticas(self):
+		with self.lock:
+			return {
+				"entradas": len(self.entradas),
+				"bytes": self.bytes,
+				"maxEntradas": self.maxEntradas,
+				"maxBytes": self.maxBytes,
+				"acertos": self.acertos,
+				"falhas": self.falhas,
+				"despejos": self.despejos,
+				"invalidacoes": self.invalidacoes,
+				"retomadas": self.retomadas
+			}
+
+
+
+cache = CacheDeContagens(config["cacheMaxEntradas"], config["cacheMaxBytes"])
+
+
+
+# --| ContagensEmAndamento |-- classe
+# junta os pedidos simultâneos pela mesma contagem (single-flight): o primeiro conta, e os que chegam enquanto isso
+# esperam e recebem o mesmo resultado, em vez de lerem e contarem o mesmo arquivo de novo
+class ContagensEmAndamento:
+	def __init__(self):
+		self.emAndamento = {}	# chave -> Future com o resultado da contagem
+		
+		# contadores
+		self.contagens = 0	# contagens feitas de fato
+		self.coalescidos = 0	# pedidos que esperaram a contagem de outro
+		
+		# exclusão mútua
+		self.lock = Lock()
+	
+	
+	
+	# input: a chave da contagem (que deve incluir a identidade do arquivo) e a função que faz a contagem
+	# output: o resultado da função, calculado por este pedido ou pelo que já estava calculando a mesma chave
+	def executar(self, chave, contar):
+		with self.lock:
+			futuro = self.emAndamento.get(chave)
+			if futuro is None:
+				futuro = self.emAndamento[chave] = Future()
+				self.contagens += 1
+				primeiro = True
+			else:
+				self.coalescidos += 1
+				primeiro = False
+		
+		# já há uma contagem igual em andamento: espera o resultado dela (ou o mesmo erro)
+		if not primeiro:
+			return futuro.result()
+		
+		try:
+			resultado = contar()
+			futuro.set_result(resultado)
+			return resultado
+		except BaseException as erro:
+			futuro.set_exception(erro)
+			raise
+		finally:
+			with self.lock:
+				del self.emAndamento[chave]
+	
+	
+	
+	# input: None
+	# output: um dict com as contagens feitas, os pedidos coalescidos e as contagens em andamento agora
+	def estatisticas(self):
+		with self.lock:
+			return {
+				"contagens": self.contagens,
+				"coalescidos": self.coalescidos,
+				"emAndamento": len(self.emAndamento)
+			}
+
+
+
+contagensEmAndamento = ContagensEmAndamento()
+
+
+
+'''
++---------------
+| Camada de processamento
++---------------
+'''
+# input: um iterável de blocos de texto
+# output: um gerador que dá, para cada bloco, a lista das palavras que terminam nele
+def palavrasDosBlocos(blocos):
+	resto = ""	# pedaço de palavra que ficou no fim do bloco anterior
+	
+	for bloco in blocos:
+		text = resto + bloco
+		wordList = text.split()	# cria uma lista com as palavras do bloco
+		
+		# se o bloco não termina em espaço, a última palavra pode continuar no próximo bloco
+		if wordList and not text[-1].isspace():
+			resto = wordList.pop()
+		else:
+			resto = ""
+		
+		yield wordList
+	
+	# a última palavra do arquivo
+	if resto:
+		yield [resto]
+
+
+
+# input: um iterável de blocos de texto
+# output: um dict com o número de ocorrências de cada palavra, na ordem em que cada palavra aparece pela primeira vez
+def contarPalavras(blocos):
+	wordDict = Counter()	# dict para contar a ocorrência de cada palavra
+	
+	# conta as ocorrências bloco a bloco
+	for wordList in palavrasDosBlocos(blocos):
+		wordDict.update(wordList)
+	
+	return wordDict
+
+
+
+# caracteres que o str.split trata como espaço, mas o bytes.split não: os ASCII de 0x1c a 0x1f viram espaço,
+# e as sequências UTF-8 dos espaços não ASCII (U+0085, U+00A0, U+1680, U+2000 a U+200A, U+2028, U+2029, U+202F, U+205F, U+3000)
+# obrigam a voltar para a contagem em texto
+SEPARADORES_ASCII = bytes.maketrans(b"\x1c\x1d\x1e\x1f", b"    ")
+ESPACO_UTF8 = re.compile(rb"\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80")
+
+# primeiros bytes das sequências acima; procurar um byte com "in" (memchr) é bem mais barato que a expressão regular,
+# que só roda quando algum aparece (o texto com acentos do português usa o \xc3, que não está aqui)
+INICIOS_ESPACO_UTF8 = (b"\xc2", b"\xe1", b"\xe2", b"\xe3")
+
+# codificação -> tabela que troca por espaço ASCII os bytes que são espaço nela, mas não para o bytes.split
+tabelasDeSeparadores = {"utf-8": SEPARADORES_ASCII, "ascii": SEPARADORES_ASCII}
+
+
+
+# input: o nome de uma codificação
+# output: a tabela de separadores da codificação para o bytes.translate, ou None se as palavras não podem ser contadas
+# nos bytes dela (só o UTF-8, o ASCII e as codificações de um byte por caractere compatíveis com ASCII podem)
+def tabelaDeSeparadores(codificacao):
+	nome = codecs.lookup(codificacao).name
+	
+	if nome not in tabelasDeSeparadores:
+		if compativelComAscii(nome):
+			# num byte por caractere, cada byte é um caractere: os que decodificam para espaço viram espaço
+			espacos = bytes(b for b in range(256) if bytes([b]).decode(nome, errors = "ignore").isspace() and not bytes([b]).isspace())
+			tabelasDeSeparadores[nome] = bytes.maketrans(espacos, b" "*len(espacos))
+		else:
+			# UTF-16, UTF-32, codificações asiáticas: um byte de espaço pode ser parte de outro caractere
+			tabelasDeSeparadores[nome] = None
+	
+	return tabelasDeSeparadores[nome]
+
+
+
+# --| EspacoNaoAscii |-- exceção
+# o arquivo tem um espaço que a contagem em bytes não reconhece
+class EspacoNaoAscii(Exception):
+	pass
+
+
+
+# --| ContagemEmBytes |-- classe
+# contagem em que as palavras são bytes na codificação do arquivo; só as palavras da resposta são decodificadas
+class ContagemEmBytes(Counter):
+	codificacao = "utf-8"
+
+
+
+# input: um iterável de blocos de bytes e a codificação deles (que precisa ter uma tabela de separadores)
+# output: um gerador que dá, para cada bloco, a lista das palavras em bytes que terminam nele, as mesmas que
+# palavrasDosBlocos daria no texto decodificado (lança EspacoNaoAscii se o texto em UTF-8 tiver um espaço fora do ASCII)
+def palavrasDosBlocosEmBytes(blocos, codificacao = "utf-8"):
+	tabela = tabelaDeSeparadores(codificacao)
+	multibyte = tabela is SEPARADORES_ASCII
+	resto = b""	# pedaço de palavra que ficou no fim do bloco anterior
+	
+	for bloco in blocos:
+		if multibyte:
+			# os testes baratos vêm antes: a maioria dos blocos é ASCII puro e não tem os separadores 0x1c a 0x1f
+			if b"\x1c" in bloco or b"\x1d" in bloco or b"\x1e" in bloco or b"\x1f" in bloco:
+				bloco = bloco.translate(SEPARADORES_ASCII)
+		else:
+			bloco = bloco.translate(tabela)
+		text = resto + bloco
+		if multibyte and not text.isascii() and any(inicio in text for inicio in INICIOS_ESPACO_UTF8) and ESPACO_UTF8.search(text):
+			raise EspacoNaoAscii()
+		
+		wordList = text.split()
+		
+		# se o bloco não termina em espaço, a última palavra pode continuar no próximo bloco
+		if wordList and not text[-1:].isspace():
+			resto = wordList.pop()
+		else:
+			resto = b""
+		
+		yield wordList
+	
+	# a última palavra do arquivo
+	if resto:
+		yield [resto]
+
+
+
+# input: um iterável de blocos de bytes e a codificação deles (que precisa ter uma tabela de separadores)
+# output: a contagem das palavras, em bytes, igual à que contarPalavras faria no texto decodificado
+# (lança EspacoNaoAscii se o texto em UTF-8 tiver um espaço fora do ASCII)
+def contarPalavrasEmBytes(blocos, codificacao = "utf-8"):
+	wordDict = ContagemEmBytes()
+	wordDict.codificacao = codecs.lookup(codificacao).name
+	
+	for wordList in palavrasDosBlocosEmBytes(blocos, codificacao):
+		wordDict.update(wordList)
+	
+	return wordDict
+
+
+
+# input: um dict com o número de ocorrências de cada palavra e quantas palavras retornar
+# output: as k palavras mais frequentes, cada uma seguida de um espaço
+def maisFrequentes(wordDict, k = K_PADRAO):
+	# seleciona as k mais frequentes com um heap de tamanho k, em O(n log k) em vez de ordenar o vocabulário inteiro
+	# (nlargest é estável: em caso de empate, vem antes a palavra que apareceu primeiro, como no sorted)
+	if k*8 < len(wordDict):
+		frequencyList = heapq.nlargest(k, wordDict.items(), key = itemgetter(1))
+	else:
+		# para k perto do tamanho do vocabulário, ordenar tudo sai mais barato que o heap
+		frequencyList = sorted(wordDict.items(), key = itemgetter(1), reverse = True)[:k]
+	
+	# monta a resposta de uma vez só, cada palavra seguida de um espaço
+	if not frequencyList:
+		return ""
+	palavras = map(itemgetter(0), frequencyList)
+	
+	# numa contagem em bytes, só as k palavras escolhidas são decodificadas
+	if isinstance(wordDict, ContagemEmBytes):
+		palavras = [palavra.decode(wordDict.codificacao, errors = "replace") for palavra in palavras]
+	
+	return " ".join(palavras) + " "
+
+
+
+# input: um texto
+# output: as 5 palavras mais frequentes
+def contadorDePalavra(text):
+	return maisFrequentes(contarPalavras([text]))
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Contagem aproximada
++---------------
+'''
+# --| EsbocoDeFrequencias |-- classe
+# contagem aproximada com memória fixa (algoritmo Space-Saving): acompanha no máximo `capacidade` palavras; quando chega uma
+# palavra nova e não há espaço, ela herda o contador da palavra menos frequente, que é descartada
+# a contagem de cada palavra acompanhada nunca é menor que a real, e passa dela no máximo pelo erro guardado junto,
+# que por sua vez é no máximo (total de palavras)/capacidade; toda palavra com mais ocorrências que isso está no esboço
+class EsbocoDeFrequencias:
+	def __init__(self, capacidade, codificacao = None):
+		self.capacidade = capacidade
+		self.codificacao = codificacao	# codificação das palavras em bytes, ou None se as palavras são str
+		self.contadores = {}	# palavra -> [contagem, erro]
+		self.heap = []	# (contagem, ordem, palavra), uma entrada por palavra, com a contagem possivelmente desatualizada
+		self.ordem = 0	# desempate do heap
+		self.total = 0	# total de palavras vistas
+	
+	
+	
+	# input: uma palavra e quantas vezes ela apareceu
+	# output: None
+	def atualizar(self, palavra, quantidade):
+		self.total += quantidade
+		contador = self.contadores.get(palavra)
+		
+		# palavra já acompanhada: só soma (o heap é corrigido depois, quando ela chegar ao topo)
+		if contador is not None:
+			contador[0] += quantidade
+			return
+		
+		# palavra nova: ocupa um lugar livre, ou o lugar da menos frequente, herdando a contagem dela como erro
+		erro = self.descartarMinimo() if self.capacidade <= len(self.contadores) else 0
+		self.contadores[palavra] = [erro + quantidade, erro]
+		heapq.heappush(self.heap, (erro + quantidade, self.ordem, palavra))
+		self.ordem += 1
+	
+	
+	
+	# input: None
+	# output: a contagem da palavra menos frequente, que deixa de ser acompanhada
+	def descartarMinimo(self):
+		while True:
+			contagem, ordem, palavra = self.heap[0]
+			atual = self.contadores[palavra][0]
+			
+			# a entrada do topo está em dia: é mesmo a menor contagem
+			if atual == contagem:
+				heapq.heappop(self.heap)
+				del self.contadores[palavra]
+				return contagem
+			
+			# senão, atualiza a entrada e desce ela no heap
+			heapq.heapreplace(self.heap, (atual, ordem, palavra))
+	
+	
+	
+	# input: um dict com o número de ocorrências de cada palavra de um bloco
+	# output: None
+	def atualizarBloco(self, contagemDoBloco):
+		for palavra, quantidade in contagemDoBloco.items():
+			self.atualizar(palavra, quantidade)
+	
+	
+	
+	# input: quantas palavras retornar
+	# output: uma lista de triplas (P, C, E) com as k palavras de maior contagem, a contagem C e o erro E de cada uma
+	# (a contagem real de P fica entre C - E e C)
+	def maisFrequentes(self, k):
+		itens = heapq.nlargest(k, self.contadores.items(), key = lambda item: item[1][0])
+		
+		if self.codificacao is None:
+			return [(palavra, contagem, erro) for palavra, (contagem, erro) in itens]
+		return [(palavra.decode(self.codificacao, errors = "replace"), contagem, erro) for palavra, (contagem, erro) in itens]
+
+
+
+# input: um gerador das listas de palavras de cada bloco, a capacidade do esboço e a codificação das palavras em bytes
+# output: o esboço com as frequências aproximadas das palavras
+# (cada bloco é contado exatamente antes de entrar no esboço, então a memória extra é limitada pelo tamanho do bloco)
+def esbocarPalavras(palavras, capacidade, codificacao = None):
+	esboco = EsbocoDeFrequencias(capacidade, codificacao)
+	for wordList in palavras:
+		esboco.atualizarBloco(Counter(wordList))
+	return esboco
+
+
+
+# input: um esboço e quantas palavras retornar
+# output: as k palavras de maior contagem, cada uma no formato "palavra:mínimo-máximo" (o intervalo onde está a contagem
+# real) seguida de um espaço
+def maisFrequentesAproximado(esboco, k = K_PADRAO):
+	itens = esboco.maisFrequentes(k)
+	if not itens:
+		return ""
+	return " ".join(f"{palavra}:{contagem - erro}-{contagem}" for palavra, contagem, erro in itens) + " "
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Contagem em paralelo
++---------------
+'''
+executorDeContagem = None	# pool de processos, criado no primeiro uso
+lockDoExecutor = Lock()
+
+
+
+# input: None
+# output: quantos processos contam as faixas de um arquivo
+def numeroDeProcessos():
+	return config["processosDeContagem"] or os.cpu_count()
+
+
+
+# input: None
+# output: o pool de processos que contam as faixas dos arquivos grandes
+def obterExecutorDeContagem():
+	global executorDeContagem
+	
+	with lockDoExecutor:
+		if executorDeContagem is None:
+			# spawn em vez de fork: o servidor tem várias threads, e fazer fork de um processo com threads não é seguro
+			executorDeContagem = ProcessPoolExecutor(
+				max_workers = numeroDeProcessos(),
+				mp_context = multiprocessing.get_context("spawn")
+			)
+	
+	return executorDeContagem
+
+
+
+# input: o caminho do arquivo, uma faixa de bytes e a codificação do texto
+# output: a contagem das palavras da faixa (roda num processo do pool)
+def contarFaixa(caminho, inicio, fim, codificacao, emBytes = False):
+	with open(caminho, mode = 'rb') as file:
+		if emBytes:
+			return contarPalavrasEmBytes(blocosBrutosDaFaixa(file, inicio, fim), codificacao)
+		return contarPalavras(blocosDaFaixa(file, inicio, fim, codificacao))
+
+
+
+# input: o caminho do arquivo, o tamanho dele em bytes e a codificação do texto
+# output: a contagem das palavras do arquivo, igual à da contagem sequencial
+def contarEmParalelo(caminho, tamanhoDoArquivo, codificacao):
+	executor = obterExecutorDeContagem()
+	
+	# map: divide o arquivo em uma faixa por processo, sem cortar nenhuma palavra
+	with open(caminho, mode = 'rb') as file:
+		faixas = faixasDoArquivo(file, tamanhoDoArquivo, numeroDeProcessos())
+	
+	# conta nos bytes quando a codificação permite; se alguma faixa tiver um espaço fora do ASCII, conta tudo de novo em texto
+	emBytes = config["contagemEmBytes"] and tabelaDeSeparadores(codificacao) is not None
+	while True:
+		parciais = executor.map(
+			contarFaixa,
+			[caminho]*len(faixas),
+			[inicio for inicio, _ in faixas],
+			[fim for _, fim in faixas],
+			[codificacao]*len(faixas),
+			[emBytes]*len(faixas)
+		)
+		
+		# reduce: junta as contagens na ordem das faixas, assim cada palavra fica na posição da sua primeira ocorrência
+		wordDict = ContagemEmBytes() if emBytes else Counter()
+		try:
+			for parcial in parciais:
+				wordDict.update(parcial)
+		except EspacoNaoAscii:
+			emBytes = False
+			continue
+		
+		if emBytes:
+			wordDict.codificacao = codecs.lookup(codificacao).name
+		return wordDict
+
+
+
+# ----------------
+
+
+
+# input: um arquivo compactado aberto, o formato de compressão e a capacidade do esboço (0 para a contagem exata)
+# output: a contagem das palavras do conteúdo descompactado (ou o esboço delas); o conteúdo passa pela contagem
+# bloco a bloco, sem nunca ser descompactado inteiro, nem no disco nem na memória
+def contarCompactado(file, compressao, capacidade = 0):
+	codificacao = codecs.lookup(file.encoding).name
+	
+	try:
+		# conta nos bytes quando a codificação permite, como nos arquivos normais
+		if config["contagemEmBytes"] and tabelaDeSeparadores(codificacao) is not None:
+			try:
+				with abrirDescompactado(file, compressao) as fluxo:
+					origem = medirLeitura(blocos(fluxo))
+					if capacidade:
+						return esbocarPalavras(palavrasDosBlocosEmBytes(origem, codificacao), capacidade, codificacao)
+					return contarPalavrasEmBytes(origem, codificacao)
+			except EspacoNaoAscii:
+				pass
+		
+		# senão, decodifica o fluxo descompactado e conta no texto
+		with io.TextIOWrapper(abrirDescompactado(file, compressao), encoding = file.encoding) as fluxo:
+			origem = medirLeitura(blocos(fluxo))
+			if capacidade:
+				return esbocarPalavras(palavrasDosBlocos(origem), capacidade)
+			return contarPalavras(origem)
+	except ERROS_DE_DESCOMPACTACAO as erro:
+		raise OSError("arquivo compactado corrompido") from erro
+
+
+
+# input: um arquivo aberto, o tamanho dele em bytes, a capacidade do esboço (0 para a contagem exata)
+# e o formato de compressão (None se o arquivo não é compactado)
+# output: a contagem das palavras do arquivo (ou o esboço delas), pelo caminho mais rápido que a configuração
+# e a codificação permitem
+def contarArquivo(file, tamanhoDoArquivo, capacidade = 0, compressao = None):
+	codificacao = codecs.lookup(file.encoding).name
+	
+	# os arquivos compactados são descompactados em fluxo (sem paralelismo nem mmap, que precisam dos bytes no disco)
+	if compressao is not None:
+		return contarCompactado(file, compressao, capacidade)
+	
+	# os arquivos grandes são contados em vários processos (só na contagem exata)
+	if not capacidade and config["limiarParalelo"] <= tamanhoDoArquivo and 1 < numeroDeProcessos() and compativelComAscii(codificacao):
+		return contarEmParalelo(os.path.abspath(file.name), tamanhoDoArquivo, file.encoding)
+	
+	# conta direto nos bytes (lidos em blocos ou mapeados na memória) e só decodifica as palavras da resposta,
+	# a não ser que a codificação não permita ou que o texto tenha espaços fora do ASCII
+	mapeado = config["camadaDeDados"] == "mmap"
+	if (config["contagemEmBytes"] or mapeado) and tabelaDeSeparadores(codificacao) is not None:
+		try:
+			origem = medirLeitura(blocosMapeados(file, tamanhoDoArquivo) if mapeado else blocos(file.buffer))
+			if capacidade:
+				return esbocarPalavras(palavrasDosBlocosEmBytes(origem, codificacao), capacidade, codificacao)
+			return contarPalavrasEmBytes(origem, codificacao)
+		except EspacoNaoAscii:
+			file.seek(0)
+	
+	# os outros são lidos, decodificados e contados bloco a bloco
+	if capacidade:
+		return esbocarPalavras(palavrasDosBlocos(medirLeitura(blocos(file))), capacidade)
+	return contarPalavras(medirLeitura(blocos(file)))
+
+
+
+# input: um arquivo aberto em modo binário, o tamanho contado e a codificação da contagem em bytes
+# output: o ponto de retomada da contagem, uma tripla (F, R, A) onde F é o tamanho contado, R é a última palavra
+# se ela pode continuar num acréscimo (b"" se o arquivo termina em espaço) e A é a assinatura dos bytes antes de F,
+# ou None se a última palavra não cabe na janela
+def pontoDeRetomada(file, fim, codificacao):
+	janela = janelaAntesDe(file, fim)
+	if janela is None:
+		return None
+	
+	texto = janela.translate(tabelaDeSeparadores(codificacao))
+	resto = b"" if not texto or texto[-1:].isspace() else texto.rsplit(None, 1)[-1]
+	
+	# a janela inteira é uma palavra só, que pode ter começado antes dela
+	if len(resto) == len(janela) and len(janela) < fim:
+		return None
+	
+	return (fim, resto, zlib.crc32(janela))
+
+
+
+# input: um arquivo aberto, o tamanho atual dele, a contagem guardada e o ponto de retomada dela
+# output: uma tripla (C, B, P) onde C é a contagem do arquivo inteiro, feita lendo só o que foi acrescentado desde
+# a contagem guardada, B é quantos bytes foram lidos e P quantas palavras foram contadas; ou None se os bytes antes
+# do fim antigo mudaram (o arquivo foi reescrito, não só cresceu) ou se o acréscimo não pode ser contado em bytes
+def contarCauda(file, tamanhoDoArquivo, wordDict, retomada):
+	fim, resto, assinatura = retomada
+	janela = janelaAntesDe(file.buffer, fim)
+	if janela is None or zlib.crc32(janela) != assinatura:
+		return None
+	
+	# a última palavra da contagem guardada pode continuar no acréscimo: ela sai da contagem e é lida de novo
+	# (a cópia deixa a contagem guardada intacta para quem ainda a estiver usando)
+	novo = wordDict.copy()
+	novo.codificacao = wordDict.codificacao
+	if resto:
+		novo[resto] -= 1
+		if novo[resto] == 0:
+			del novo[resto]
+	
+	inicio = fim - len(resto)
+	try:
+		cauda = contarPalavrasEmBytes(medirLeitura(blocosBrutosDaFaixa(file.buffer, inicio, tamanhoDoArquivo)), novo.codificacao)
+	except EspacoNaoAscii:
+		return None
+	
+	# as palavras novas entram depois das antigas, na ordem da sua primeira ocorrência no acréscimo
+	novo.update(cauda)
+	return (novo, tamanhoDoArquivo - inicio, sum(cauda.values()) - (1 if resto else 0))
+
+
+
+# input: nome do arquivo em bytes, a capacidade do esboço (0 para a contagem exata) e a função que conta o arquivo
+# quando ele não está no cache (com os argumentos de contarArquivo)
+# output: uma dupla (C, E) onde C é a contagem das palavras do arquivo (ou o esboço delas) e E é verdadeiro sse o arquivo existe
+def obterContagem(nomeDoArquivo, capacidade = 0, contador = contarArquivo):
+	medicao = medicaoAtual()
+	
+	# pega o arquivo aberto e se o arquivo existe
+	inicio = time.perf_counter()
+	file, fileFound = dados(nomeDoArquivo)
+	medicao.dados += time.perf_counter() - inicio
+	
+	if not fileFound:
+		return (None, False)
+	
+	with file:
+		# a chave do cache tem a compressão (um arquivo compactado e a sua cópia normal nunca se confundem)
+		# e a capacidade (os esboços ficam ao lado da contagem exata)
+		compressao = compressaoDoArquivo(file)
+		chave = (os.path.abspath(file.name), compressao, capacidade)
+		identidadeAtual = identidade(file)
+		
+		# usa a contagem do cache se o arquivo não mudou desde então
+		wordDict = cache.obter(chave, identidadeAtual)
+		if wordDict is not None:
+			return (wordDict, True)
+		
+		# senão, conta as palavras
+		def contar():
+			# se o arquivo só cresceu desde a contagem guardada, conta só o que foi acrescentado
+			anterior = cache.retomavel(chave, identidadeAtual)
+			retomado = contarCauda(file, identidadeAtual[2], *anterior) if anterior is not None else None
+			
+			if retomado is not None:
+				wordDict, bytesLidos, palavras = retomado
+				medicao.bytesLidos += bytesLidos
+				medicao.palavras += palavras
+			else:
+				file.seek(0)	# contarCauda pode ter lido do meio do arquivo
+				wordDict = contador(file, identidadeAtual[2], capacidade, compressao)
+				medicao.bytesLidos += identidadeAtual[2]
+				medicao.palavras += wordDict.total if capacidade else sum(wordDict.values())
+			
+			# só guarda se o arquivo não mudou durante a contagem; a contagem exata em bytes de um arquivo
+			# não compactado guarda também de onde continuar se ele crescer
+			if identidade(file) == identidadeAtual:
+				retomada = None
+				if config["contagemIncremental"] and not capacidade and compressao is None and isinstance(wordDict, ContagemEmBytes):
+					retomada = pontoDeRetomada(file.buffer, identidadeAtual[2], wordDict.codificacao)
+				cache.guardar(chave, identidadeAtual, wordDict, retomada)
+			return wordDict
+		
+		# pedidos simultâneos pelo mesmo arquivo, na mesma versão, esperam uma só contagem
+		wordDict = contagensEmAndamento.executar((chave, identidadeAtual), contar)
+	
+	return (wordDict, True)
+
+
+
+# input: nome do arquivo em bytes, quantas palavras retornar e a capacidade do esboço (0 para a contagem exata)
+# output: as k palavras mais frequentes, ou uma mensagem de erro de arquivo não encontrado
+def processamento(nomeDoArquivo, k = K_PADRAO, capacidade = 0):
+	# pega a contagem das palavras e se o arquivo existe
+	wordDict, fileFound = obterContagem(nomeDoArquivo, capacidade)
+	
+	if fileFound:
+		# se o arquivo existe, retorna as k palavras mais frequentes (com o intervalo da contagem, se ela é aproximada)
+		if capacidade:
+			return maisFrequentesAproximado(wordDict, k).encode("utf-8")
+		return maisFrequentes(wordDict, k).encode("utf-8")
+	else:
+		# se o arquivo não existe, retorna uma mensagem de erro de arquivo não encontrado
+		return "Arquivo não encontrado".encode("utf-8")
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Corpus
++---------------
+'''
+# input: os mesmos argumentos de contarArquivo
+# output: a mesma contagem de contarArquivo, mas feita inteira num processo do pool de contagem, para os arquivos de um
+# corpus serem contados ao mesmo tempo; os compactados, os esboços, os arquivos grandes (que contarArquivo já divide
+# entre os processos) e as codificações não compatíveis com ASCII são contados nesta thread
+def contarNoProcesso(file, tamanhoDoArquivo, capacidade = 0, compressao = None):
+	codificacao = codecs.lookup(file.encoding).name
+	if capacidade or compressao is not None or numeroDeProcessos() < 2 or config["limiarParalelo"] <= tamanhoDoArquivo or not compativelComAscii(codificacao):
+		return contarArquivo(file, tamanhoDoArquivo, capacidade, compressao)
+	
+	# o arquivo inteiro é uma faixa só; conta nos bytes quando a codificação permite e, se houver um espaço fora do ASCII, em texto
+	executor = obterExecutorDeContagem()
+	caminho = os.path.abspath(file.name)
+	if config["contagemEmBytes"] and tabelaDeSeparadores(codificacao) is not None:
+		try:
+			wordDict = executor.submit(contarFaixa, caminho, 0, tamanhoDoArquivo, codificacao, True).result()
+			wordDict.codificacao = codificacao	# o atributo não sobrevive ao pickle
+			return wordDict
+		except EspacoNaoAscii:
+			pass
+	return executor.submit(contarFaixa, caminho, 0, tamanhoDoArquivo, codificacao).result()
+
+
+
+# input: o nome de um arquivo do corpus em bytes
+# output: uma dupla (C, M) onde C é a contagem do arquivo (None se ele não existe ou não pôde ser lido)
+# e M é a medição da contagem, feita na thread do pool
+def contarDoCorpus(nomeDoArquivo):
+	medicao = medicoes.atual = Medicao()
+	try:
+		wordDict, _ = obterContagem(nomeDoArquivo, 0, contarNoProcesso)
+	except (OSError, UnicodeDecodeError):
+		wordDict = None
+	return (wordDict, medicao)
+
+
+
+# input: um dict com a contagem total do corpus e a contagem de um arquivo
+# output: a contagem total com a do arquivo somada (as palavras novas entram no fim, na ordem da contagem do arquivo);
+# se as duas forem em bytes na mesma codificação, a soma continua em bytes, senão tudo passa para texto
+def somarContagens(total, wordDict):
+	if isinstance(total, ContagemEmBytes) and not (isinstance(wordDict, ContagemEmBytes) and wordDict.codificacao == total.codificacao):
+		total = Counter({palavra.decode(total.codificacao, errors = "replace"): n for palavra, n in total.items()})
+	if isinstance(wordDict, ContagemEmBytes) and not isinstance(total, ContagemEmBytes):
+		wordDict = {palavra.decode(wordDict.codificacao, errors = "replace"): n for palavra, n in wordDict.items()}
+	
+	total.update(wordDict)
+	return total
+
+
+
+# input: um pedido de corpus validado e uma função que recebe o progresso (arquivos feitos e total), ou None
+# output: as k palavras mais frequentes do corpus inteiro, como se os arquivos fossem um texto só, na ordem da lista
+# (ou do padrão, em ordem alfabética), ou uma mensagem de erro
+def processamentoDoCorpus(pedido, progresso = None):
+	# os arquivos vêm da lista ou do padrão (glob, com ** para entrar nas subpastas)
+	if pedido["arquivos"] is not None:
+		nomes = pedido["arquivos"]
+	else:
+		# o padrão é percorrido sob demanda e para um arquivo depois do limite, sem varrer a árvore inteira
+		arquivos = (caminho for caminho in glob.iglob(pedido["padrao"], recursive = True) if os.path.isfile(caminho))
+		nomes = [caminho.encode("utf-8") for caminho in sorted(itertools.islice(arquivos, config["maxArquivosDoCorpus"] + 1))]
+	
+	if not nomes:
+		return "Arquivo não encontrado".encode("utf-8")
+	if config["maxArquivosDoCorpus"] < len(nomes):
+		return "Corpus grande demais".encode("utf-8")
+	
+	# map: conta os arquivos ao mesmo tempo (os que estão no cache nem são lidos)
+	# reduce: soma as contagens na ordem dos arquivos, então o desempate é o mesmo de um texto só
+	medicao = medicaoAtual()
+	total = None
+	ultimoAviso = time.perf_counter()
+	with ThreadPoolExecutor(max_workers = min(numeroDeProcessos(), len(nomes))) as executor:
+		for feitos, (wordDict, medicaoDoArquivo) in enumerate(executor.map(contarDoCorpus, nomes), 1):
+			medicao.dados += medicaoDoArquivo.dados
+			medicao.bytesLidos += medicaoDoArquivo.bytesLidos
+			medicao.palavras += medicaoDoArquivo.palavras
+			
+			if wordDict is not None:
+				# a soma começa do mesmo tipo da primeira contagem
+				if total is None:
+					total = type(wordDict)()
+					if isinstance(wordDict, ContagemEmBytes):
+						total.codificacao = wordDict.codificacao
+				total = somarContagens(total, wordDict)
+			
+			# avisa o progresso de tempos em tempos, para o cliente saber que o pedido não travou
+			if progresso is not None and feitos < len(nomes) and config["intervaloDeProgresso"] <= time.perf_counter() - ultimoAviso:
+				progresso(feitos, len(nomes))
+				ultimoAviso = time.perf_counter()
+	
+	if total is None:
+		return "Erro ao ler o arquivo".encode("utf-8")
+	return maisFrequentes(total, pedido["k"]).encode("utf-8")
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Palíndromos
++---------------
+'''
+executorDePalindromos = None	# pool de processos dos palíndromos, criado no primeiro uso
+
+
+
+# --| PrazoEsgotado |-- exceção
+# o cálculo do palíndromo passou do prazo do pedido
+class PrazoEsgotado(Exception):
+	pass
+
+
+
+# input: None
+# output: o pool de processos que calculam os palíndromos; é separado do pool da contagem, para um palíndromo
+# demorado nunca ocupar os processos que as contagens esperam
+def obterExecutorDePalindromos():
+	global executorDePalindromos
+	
+	with lockDoExecutor:
+		if executorDePalindromos is None:
+			executorDePalindromos = ProcessPoolExecutor(
+				max_workers = config["processosDePalindromo"],
+				mp_context = multiprocessing.get_context("spawn")
+			)
+	
+	return executorDePalindromos
+
+
+
+# input: o caminho do arquivo, a codificação do texto e o instante (em time.time()) em que o prazo acaba
+# output: o maior palíndromo do texto do arquivo (roda num processo do pool de palíndromos)
+# (lança PrazoEsgotado se o prazo acabar antes, contando o tempo em que o pedido esperou na fila do pool)
+def calcularPalindromo(caminho, codificacao, limite):
+	restante = limite - time.time()
+	if restante <= 0:
+		raise PrazoEsgotado()
+	
+	# o alarme interrompe o cálculo no prazo, e o processo fica livre para o próximo pedido (o setitimer só existe
+	# em sistemas Unix; nos outros, o pedido ainda responde no prazo, mas o processo termina o cálculo à toa)
+	def esgotar(sinal, quadro):
+		raise PrazoEsgotado()
+	
+	alarme = hasattr(signal, "setitimer")
+	if alarme:
+		signal.signal(signal.SIGALRM, esgotar)
+		signal.setitimer(signal.ITIMER_REAL, restante)
+	try:
+		with open(caminho, mode = 'r', encoding = codificacao) as file:
+			return longestPalindrome(file.read())
+	finally:
+		if alarme:
+			signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+
+# input: nome do arquivo em bytes e o prazo do pedido em segundos
+# output: o maior palíndromo do texto do arquivo (o mais à direita, se houver mais de um), ou uma mensagem de erro
+def processamentoDoPalindromo(nomeDoArquivo, prazo):
+	file, fileFound = dados(nomeDoArquivo)
+	if not fileFound:
+		return "Arquivo não encontrado".encode("utf-8")
+	
+	with file:
+		tamanho = os.fstat(file.fileno()).st_size
+		caminho, codificacao = os.path.abspath(file.name), file.encoding
+	
+	# o cálculo guarda algumas listas do tamanho do texto, então o tamanho do arquivo é limitado
+	if config["maxTamanhoDoPalindromo"] < tamanho:
+		return "Arquivo grande demais".encode("utf-8")
+	
+	# esta thread só espera: o cálculo roda no pool, sem disputar o GIL com as contagens
+	futuro = obterExecutorDePalindromos().submit(calcularPalindromo, caminho, codificacao, time.time() + prazo)
+	try:
+		return futuro.result(timeout = prazo + 1.0).encode("utf-8")	# o segundo a mais é para a exceção do alarme chegar
+	except (PrazoEsgotado, FuturoAtrasado):
+		futuro.cancel()	# se ainda estava na fila do pool
+		return "Tempo esgotado".encode("utf-8")
+
+
+
+# ----------------
 
 
 
 '''
 +---------------
-| Camada de dados
+| Camada de interface
 +---------------
 '''
-# input: nome do arquivo em bytes
-# output: uma dupla (T, E) onde T é o texto completo do arquivo e E é verdadeiro sse o arquivo existe
-def dados(nomeDoArquivo):
-	name = bytes(nomeDoArquivo).decode("utf-8")	# pega o nome do arquivo em formato str
+# input: a mensagem do cliente em bytes, no formato "nome do arquivo" seguido de linhas opcionais "chave=valor"
+# (k=<palavras>, modo=exato ou modo=aproximado, capacidade=<palavras acompanhadas no modo aproximado>,
+# tipo=estatisticas para pedir as estatísticas do servidor em vez de uma contagem)
+# output: o pedido em forma de dict
+# (lança ValueError se o pedido for inválido)
+def interpretarPedido(mensagem):
+	linhas = bytes(mensagem).split(b"\n")
+	pedido = {"arquivo": linhas[0]}
+	
+	# lê as opções
+	for linha in linhas[1:]:
+		chave, _, valor = linha.decode("utf-8").partition("=")
+		if chave in ("k", "capacidade"):
+			pedido[chave] = int(valor)
+		elif chave == "prazo":
+			pedido[chave] = float(valor)
+		elif chave in ("modo", "tipo"):
+			pedido[chave] = valor
+		elif chave != "":
+			raise ValueError("opção desconhecida: " + chave)
+	
+	return validarPedido(pedido)
+
+
+
+# input: um pedido em forma de dict, vindo de uma mensagem de texto ou de um quadro JSON
+# output: o pedido com o nome do arquivo em bytes e os valores padrão preenchidos
+# (lança ValueError se o pedido for inválido)
+def validarPedido(pedido):
+	if not isinstance(pedido, dict):
+		raise ValueError("o pedido deve ser um objeto")
+	
+	# o pedido de estatísticas não tem arquivo
+	tipo = pedido.get("tipo", "contagem")
+	if tipo == "estatisticas":
+		return {"tipo": tipo}
+	if tipo not in ("contagem", "corpus", "palindromo"):
+		raise ValueError("tipo desconhecido: " + str(tipo))
+	
+	k = pedido.get("k", K_PADRAO)
+	if type(k) is not int or k < 1:
+		raise ValueError("k deve ser um inteiro positivo")
+	
+	# o corpus é uma lista de arquivos ou um padrão (no protocolo de texto, o padrão vem no lugar do nome do arquivo)
+	if tipo == "corpus":
+		if pedido.get("modo", "exato") != "exato":
+			raise ValueError("o corpus só tem o modo exato")
+		
+		arquivos = pedido.get("arquivos")
+		padrao = pedido.get("padrao", pedido.get("arquivo"))
+		if arquivos is not None:
+			if not isinstance(arquivos, list) or not arquivos or not all(isinstance(arquivo, str) for arquivo in arquivos):
+				raise ValueError("arquivos deve ser uma lista de nomes")
+			return {"tipo": tipo, "arquivos": [arquivo.encode("utf-8") for arquivo in arquivos], "padrao": None, "k": k}
+		if isinstance(padrao, bytes):
+			padrao = padrao.decode("utf-8")
+		if not isinstance(padrao, str) or not padrao:
+			raise ValueError("falta o padrão ou a lista de arquivos")
+		return {"tipo": tipo, "arquivos": None, "padrao": padrao, "k": k}
+	
+	nomeDoArquivo = pedido.get("arquivo")
+	if isinstance(nomeDoArquivo, str):
+		nomeDoArquivo = nomeDoArquivo.encode("utf-8")
+	if not isinstance(nomeDoArquivo, bytes):
+		raise ValueError("falta o nome do arquivo")
+	
+	# o pedido de palíndromo só tem o prazo, que não pode passar do da configuração
+	if tipo == "palindromo":
+		prazo = pedido.get("prazo", config["prazoDoPalindromo"])
+		if type(prazo) not in (int, float) or not 0 < prazo <= config["prazoDoPalindromo"]:
+			raise ValueError("o prazo deve ser positivo e no máximo " + str(config["prazoDoPalindromo"]))
+		return {"tipo": tipo, "arquivo": nomeDoArquivo, "prazo": prazo}
+	
+	# no modo aproximado, a contagem usa um esboço de memória fixa; a capacidade 0 indica a contagem exata
+	modo = pedido.get("modo", "exato")
+	if modo not in ("exato", "aproximado"):
+		raise ValueError("modo deve ser exato ou aproximado")
+	capacidade = pedido.get("capacidade", config["capacidadeDoEsboco"])
+	if type(capacidade) is not int or capacidade < k or config["maxCapacidadeDoEsboco"] < capacidade:
+		raise ValueError("a capacidade deve ser um inteiro maior ou igual a k e no máximo " + str(config["maxCapacidadeDoEsboco"]))
+	
+	return {"tipo": tipo, "arquivo": nomeDoArquivo, "k": k, "capacidade": capacidade if modo == "aproximado" else 0}
+
+
+
+pedidosDoProcesso = None	# no modo com vários processos, o contador compartilhado de pedidos e a posição deste processo nele
+
+
+
+# input: None
+# output: um dict com as métricas por camada, o cache, as contagens coalescidas e a fila de conexões deste processo
+def estatisticasDoServidor():
+	return {
+		"metricas": metricas.estatisticas(),
+		"cache": cache.estatisticas(),
+		"contagens": contagensEmAndamento.estatisticas(),
+		"fila": filaDeConexoes.estatisticas()
+	}
+
+
+
+# input: um pedido validado e uma função que recebe o progresso de um pedido de corpus (None se não há como avisar)
+# output: a resposta em bytes
+def atenderPedido(pedido, progresso = None):
+	if pedido["tipo"] == "estatisticas":
+		return json.dumps(estatisticasDoServidor()).encode("utf-8")
+	
+	if pedidosDoProcesso is not None:
+		contadores, indice = pedidosDoProcesso
+		with contadores.get_lock():
+			contadores[indice] += 1
+	
+	# começa a medição do pedido nesta thread
+	medicao = medicoes.atual = Medicao()
+	inicio = time.perf_counter()
 	
-	# tenta abrir o arquivo
 	try:
-		# arquivo encontrado
-		with open(name, mode = 'r') as file:
-			# retorna o texto inteiro do arquivo e um sinal de que o arquivo foi encontrado
-			return (file.read(), True)
-	except FileNotFoundError:
-		# arquivo não encontrado, então retorna um sinal falso
-		return ("", False)
+		if pedido["tipo"] == "corpus":
+			return processamentoDoCorpus(pedido, progresso)
+		if pedido["tipo"] == "palindromo":
+			return processamentoDoPalindromo(pedido["arquivo"], pedido["prazo"])
+		return processamento(pedido["arquivo"], pedido["k"], pedido["capacidade"])
+	except (OSError, ValueError):
+		# o arquivo existe, mas não é um arquivo de texto legível (uma pasta, sem permissão, binário...)
+		return "Erro ao ler o arquivo".encode("utf-8")
+	finally:
+		metricas.registrarPedido(medicao, time.perf_counter() - inicio)
+
+
+
+# input: a mensagem do cliente em bytes
+# output: a resposta em bytes
+def responder(mensagem):
+	try:
+		pedido = interpretarPedido(mensagem)
+	except ValueError:
+		return "Pedido inválido".encode("utf-8")
+	
+	return atenderPedido(pedido)
+
+
+
+# ----------------
 
 
 
 '''
 +---------------
-| Camada de processamento
+| Protocolo com quadros
 +---------------
 '''
-# input: um texto
-# output: as 5 palavras mais frequentes
-def contadorDePalavra(text):
-	wordList = text.split()	# cria uma lista de palavras
-	wordDict = {}	# dict para contar a ocorrência de cada palavra
+# cada quadro é um JSON precedido do seu tamanho em 4 bytes; os pedidos levam um "id", que volta na resposta,
+# e as respostas são enviadas na ordem em que ficam prontas
+
+# input: um dict
+# output: o quadro em bytes
+def empacotarJson(mensagem):
+	texto = json.dumps(mensagem, separators = (',', ':')).encode("utf-8")
+	return len(texto).to_bytes(4, byteorder = "little") + texto
+
+
+
+# input: o conteúdo de um quadro de pedido, em bytes, e uma função que envia um quadro antes da resposta (None se não há)
+# output: o quadro de resposta em bytes, com o mesmo id do pedido; num pedido de corpus demorado, vão antes quadros
+# de progresso, com o mesmo id e os arquivos feitos e o total no lugar da resposta
+def responderQuadro(quadro, enviarQuadro = None):
+	id = None
+	try:
+		mensagem = json.loads(quadro)
+		if isinstance(mensagem, dict):
+			id = mensagem.get("id")
+		pedido = validarPedido(mensagem)
+	except ValueError:
+		return empacotarJson({"id": id, "resposta": "Pedido inválido"})
 	
-	# conta as ocorrências
-	for w in wordList:
-		if w in wordDict:
-			wordDict[w] += 1
-		else:
-			wordDict[w] = 1
+	progresso = None
+	if enviarQuadro is not None:
+		progresso = lambda feitos, total: enviarQuadro(empacotarJson({"id": id, "progresso": {"feitos": feitos, "total": total}}))
+	
+	return empacotarJson({"id": id, "resposta": atenderPedido(pedido, progresso).decode("utf-8")})
+
+
+
+# input: o conteúdo de um quadro de pedido cujo atendimento levantou uma exceção inesperada e a exceção
+# output: um quadro de resposta de erro, com o mesmo id do pedido (o cliente não fica esperando uma resposta que não vem)
+def quadroDeErro(quadro, erro):
+	print(f"Erro ao atender um pedido: {erro!r}", file = sys.stderr)
 	
-	# ordena as palavras da mais frequente para a menos frequente
-	frequencyList = sorted(wordDict.items(), key = lambda item: item[1], reverse = True)
-	fiveWordsList = ""
+	id = None
+	try:
+		mensagem = json.loads(quadro)
+		if isinstance(mensagem, dict):
+			id = mensagem.get("id")
+	except ValueError:
+		pass
 	
-	# pega as 5 primeiras palavras
-	for i in range(min(len(frequencyList), 5)):
-		fiveWordsList += frequencyList[i][0] + " "
+	return empacotarJson({"id": id, "resposta": "Erro ao atender o pedido"})
+
+
+
+executorDePedidos = None	# pool de threads que processa os pedidos, criado no primeiro uso
+
+
+
+# input: None
+# output: o pool de threads que processa os pedidos das conexões com quadros e do modo asyncio
+def obterExecutorDePedidos():
+	global executorDePedidos
 	
-	# retorna as 5 palavras mais frequentes
-	return fiveWordsList
+	with lockDoExecutor:
+		if executorDePedidos is None:
+			executorDePedidos = ThreadPoolExecutor(max_workers = config["trabalhadores"])
 	
+	return executorDePedidos
+
 
+
+# --| SessaoDeQuadros |-- classe
+# uma conexão no protocolo com quadros, no modo select: os pedidos são lidos só quando chegam bytes e as respostas são
+# enviadas pelas threads do executor, então, entre os pedidos, a conexão espera no select sem ocupar nenhuma thread
+class SessaoDeQuadros:
+	def __init__(self, conn, sobra, aoFechar):
+		self.conn = conn
+		self.buffer = bytearray(sobra)
+		self.aoFechar = aoFechar	# chamada uma vez, quando a conexão é fechada
+		self.espera = sessoesEmEspera
+		self.executor = obterExecutorDePedidos()
+		self.prefixoLido = False
+		self.atendidos = 0
+		self.retida = False	# há pedidos inteiros no buffer esperando a conexão ter menos pedidos pendentes
+		
+		# estado compartilhado com as threads do executor
+		self.emAndamento = 0	# pedidos lidos cuja resposta ainda não foi enviada
+		self.fechando = False	# a conexão fecha quando a última resposta for enviada
+		self.ultimoUso = time.monotonic()
+		
+		# exclusão mútua (também garante que os quadros não se misturam no socket)
+		self.lockDeEnvio = Lock()
 	
-# input: nome do arquivo em bytes
-# output: as 5 palavras mais frequentes, ou uma mensagem de erro de arquivo não encontrado
-def processamento(nomeDoArquivo):
-	# pega o texto inteiro e se o arquivo existe
-	text, fileFound = dados(nomeDoArquivo)
 	
-	if fileFound:
-		# se o arquivo existe, retorna as 5 palavras mais frequentes
-		return contadorDePalavra(text).encode("utf-8")
-	else:
-		# se o arquivo não existe, retorna uma mensagem de erro de arquivo não encontrado
-		return "Arquivo não encontrado".encode("utf-8")
+	
+	# input: None
+	# output: verdadeiro sse a conexão tem pedidos pendentes demais para ler mais pedidos agora
+	def cheia(self):
+		with self.lockDeEnvio:
+			return config["maxPedidosPendentes"] <= self.emAndamento
+	
+	
+	
+	# input: o instante atual (time.monotonic)
+	# output: verdadeiro sse a conexão está sem pedidos e sem respostas a caminho há tempo demais
+	def ociosa(self, agora):
+		with self.lockDeEnvio:
+			return self.emAndamento == 0 and config["tempoOcioso"] < agora - self.ultimoUso
+	
+	
+	
+	# input: None (chamado quando o select avisa que chegaram bytes na conexão)
+	# output: verdadeiro sse a conexão continua esperando pedidos no select
+	def receber(self):
+		try:
+			dado = self.conn.recv(65536)
+		except OSError:
+			dado = b""
+		
+		# o cliente fechou a conexão: ela fecha depois das respostas pendentes
+		if not dado:
+			self.encerrar()
+			return False
+		
+		self.buffer += dado
+		return self.atender()
+	
+	
+	
+	# input: None
+	# output: verdadeiro sse a conexão continua esperando pedidos no select (processa os pedidos inteiros do buffer,
+	# sem esperar as respostas; se há pedidos pendentes demais, o resto fica retido no buffer até algum terminar)
+	def atender(self):
+		if not self.prefixoLido:
+			if len(self.buffer) < len(VERSAO_QUADROS):
+				return True
+			if self.buffer[:len(VERSAO_QUADROS)] != VERSAO_QUADROS:
+				self.encerrar()
+				return False
+			del self.buffer[:len(VERSAO_QUADROS)]
+			self.prefixoLido = True
+		
+		self.retida = False
+		self.ultimoUso = time.monotonic()
+		while self.atendidos < config["maxPedidosPorConexao"] and 4 <= len(self.buffer):
+			tamanho = int.from_bytes(self.buffer[:4], byteorder = "little")
+			if MAX_QUADRO < tamanho:
+				self.encerrar()
+				return False
+			
+			# o quadro só sai do buffer quando chegou inteiro
+			if len(self.buffer) < 4 + tamanho:
+				break
+			if self.cheia():
+				self.retida = True
+				break
+			quadro = bytes(self.buffer[4:4 + tamanho])
+			del self.buffer[:4 + tamanho]
+			
+			with self.lockDeEnvio:
+				self.emAndamento += 1
+			self.executor.submit(responderQuadro, quadro, self.enviarProgresso).add_done_callback(lambda futuro, quadro = quadro: self.enviar(futuro, quadro))
+			self.atendidos += 1
+		
+		# a conexão atingiu o limite de pedidos
+		if config["maxPedidosPorConexao"] <= self.atendidos:
+			self.encerrar()
+			return False
+		return True
+	
+	
+	
+	# input: um quadro de progresso
+	# output: None (envia o quadro entre as respostas)
+	def enviarProgresso(self, quadro):
+		try:
+			with self.lockDeEnvio:
+				enviarMedindo(self.conn, quadro)
+		except OSError:
+			pass
+	
+	
+	
+	# input: o futuro de um pedido, já concluído, e o quadro do pedido
+	# output: None (envia a resposta, ou um quadro de erro se o atendimento falhou, e fecha a conexão se ela estava
+	# só esperando esta resposta para fechar)
+	def enviar(self, futuro, quadro):
+		try:
+			try:
+				resposta = futuro.result()
+			except Exception as erro:
+				resposta = quadroDeErro(quadro, erro)
+			with self.lockDeEnvio:
+				enviarMedindo(self.conn, resposta)
+		except OSError:
+			pass
+		finally:
+			with self.lockDeEnvio:
+				self.emAndamento -= 1
+				self.ultimoUso = time.monotonic()
+				fechar = self.fechando and self.emAndamento == 0
+				liberada = self.emAndamento == config["maxPedidosPendentes"] - 1
+			
+			if fechar:
+				self.fechar()
+			elif liberada:
+				# o select volta a ler a conexão (e os pedidos retidos no buffer)
+				self.espera.acordar()
+	
+	
+	
+	# input: None
+	# output: None (fecha a conexão agora, ou depois da última resposta pendente)
+	def encerrar(self):
+		with self.lockDeEnvio:
+			self.fechando = True
+			fechar = self.emAndamento == 0
+		if fechar:
+			self.fechar()
+	
+	
+	
+	# input: None
+	# output: None
+	def fechar(self):
+		self.conn.close()
+		self.aoFechar()
 
 
 
@@ -80,18 +1825,244 @@ def processamento(nomeDoArquivo):
 
 '''
 +---------------
-| Main do Cliente
+| Fila de conexões
++---------------
+'''
+# --| FilaDeConexoes |-- classe
+# fila limitada entre o select, que aceita as conexões, e os trabalhadores, que as atendem
+class FilaDeConexoes:
+	def __init__(self, profundidade):
+		self.fila = queue.Queue(maxsize = profundidade)
+		self.profundidade = profundidade
+		
+		# contadores
+		self.aceitas = 0
+		self.rejeitadas = 0
+		self.atendidas = 0
+		self.emAtendimento = 0
+		self.profundidadeMaxima = 0
+		self.esperaTotal = 0.0
+		self.esperaMaxima = 0.0
+		
+		# exclusão mútua
+		self.lock = Lock()
+	
+	
+	
+	# input: uma conexão aceita e o endereço do cliente
+	# output: verdadeiro sse a conexão entrou na fila (falso se a fila está cheia)
+	def colocar(self, conn, addr):
+		try:
+			self.fila.put_nowait((conn, addr, time.perf_counter()))
+		except queue.Full:
+			with self.lock:
+				self.rejeitadas += 1
+			return False
+		
+		with self.lock:
+			self.aceitas += 1
+			self.profundidadeMaxima = max(self.profundidadeMaxima, self.fila.qsize())
+		return True
+	
+	
+	
+	# input: None
+	# output: uma dupla (C, A) com a próxima conexão da fila e o endereço do cliente (espera se a fila está vazia)
+	def retirar(self):
+		conn, addr, chegada = self.fila.get()
+		espera = time.perf_counter() - chegada
+		
+		with self.lock:
+			self.atendidas += 1
+			self.emAtendimento += 1
+			self.esperaTotal += espera
+			self.esperaMaxima = max(self.esperaMaxima, espera)
+		
+		return (conn, addr)
+	
+	
+	
+	# input: None
+	# output: None (avisa que o atendimento de uma conexão retirada terminou)
+	def concluir(self):
+		with self.lock:
+			self.emAtendimento -= 1
+	
+	
+	
+	# input: None
+	# output: verdadeiro sse há conexões esperando na fila ou sendo atendidas
+	def ocupada(self):
+		with self.lock:
+			return 0 < self.emAtendimento or not self.fila.empty()
+	
+	
+	
+	# input: None
+	# output: um dict com a profundidade da fila e o tempo de espera das conexões, em segundos
+	def estatisticas(self):
+		with self.lock:
+			return {
+				"profundidade": self.fila.qsize(),
+				"profundidadeMaxima": self.profundidadeMaxima,
+				"limite": self.profundidade,
+				"aceitas": self.aceitas,
+				"rejeitadas": self.rejeitadas,
+				"atendidas": self.atendidas,
+				"esperaMedia": self.esperaTotal/self.atendidas if self.atendidas else 0.0,
+				"esperaMaxima": self.esperaMaxima
+			}
+
+
+
+filaDeConexoes = FilaDeConexoes(config["profundidadeDaFila"])
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Aquecimento
 +---------------
 '''
-def clientMain(server, clientList):
-	# aceita a conexão
-	conn, addr = server.accept()
+# --| Aquecimento |-- classe
+# conta em segundo plano todos os arquivos de um diretório quando o servidor inicia, para os primeiros pedidos já acharem
+# as contagens no cache; enquanto isso o servidor atende normalmente, e os arquivos já contados saem do cache
+class Aquecimento:
+	def __init__(self, diretorio, concorrencia):
+		self.diretorio = diretorio
+		self.concorrencia = concorrencia
+		
+		# progresso
+		self.total = 0
+		self.contados = 0
+		self.falhas = 0
+		self.inicio = None
+		self.fim = None
+		
+		# exclusão mútua
+		self.lock = Lock()
+	
+	
+	
+	# input: None
+	# output: None (conta todos os arquivos da árvore do diretório, no máximo `concorrencia` ao mesmo tempo; as threads só
+	# despacham os arquivos para o pool de processos da contagem, onde eles são contados de fato em paralelo)
+	def executar(self):
+		self.inicio = time.perf_counter()
+		
+		caminhos = []
+		for raiz, diretorios, nomes in os.walk(self.diretorio):
+			diretorios.sort()
+			caminhos.extend(os.path.join(raiz, nome) for nome in sorted(nomes))
+		self.total = len(caminhos)
+		
+		print(f"Aquecimento: {self.total} arquivos em {self.diretorio}")
+		if config["cacheMaxEntradas"] < self.total:
+			print(f"Aquecimento: o cache só guarda {config['cacheMaxEntradas']} contagens; os primeiros arquivos serão descartados")
+		
+		with ThreadPoolExecutor(max_workers = self.concorrencia) as executor:
+			for _ in executor.map(self.contar, caminhos):
+				pass
+		
+		self.fim = time.perf_counter()
+		print(f"Aquecimento concluído em {self.fim - self.inicio:.1f}s: {self.contados} contados, {self.falhas} falhas")
+	
 	
-	# envia as 5 palavras mais frequentes
-	conn.sendall(processamento(conn.recv(1024)))
 	
-	# fecha a conexão
-	conn.close()
+	# input: o caminho de um arquivo
+	# output: None (conta as palavras do arquivo, o que guarda a contagem no cache, e atualiza o progresso)
+	def contar(self, caminho):
+		try:
+			_, contado = obterContagem(caminho.encode("utf-8"), 0, contarNoProcesso)
+		except (OSError, UnicodeError):
+			contado = False
+		except Exception as erro:
+			# um erro inesperado num arquivo não para o aquecimento, mas entra nas falhas
+			print(f"Aquecimento: erro ao contar {caminho}: {erro!r}", file = sys.stderr)
+			contado = False
+		
+		with self.lock:
+			if contado:
+				self.contados += 1
+			else:
+				self.falhas += 1
+			
+			# mostra o progresso a cada 10%
+			feitos = self.contados + self.falhas
+			if (feitos - 1)*10//self.total < feitos*10//self.total:
+				print(f"Aquecimento: {feitos}/{self.total} arquivos ({feitos*100//self.total}%)")
+	
+	
+	
+	# input: None
+	# output: um dict com o progresso do aquecimento
+	def estatisticas(self):
+		with self.lock:
+			fim = self.fim if self.fim is not None else time.perf_counter()
+			return {
+				"diretorio": self.diretorio,
+				"total": self.total,
+				"contados": self.contados,
+				"falhas": self.falhas,
+				"concluido": self.fim is not None,
+				"duracao": fim - self.inicio if self.inicio is not None else 0.0
+			}
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Main do Cliente
++---------------
+'''
+# input: a conexão aceita, o endereço do cliente e uma função para chamar quando o atendimento terminar
+# output: None (no protocolo com quadros, a conexão continua aberta esperando no select e a função só é chamada
+# quando ela fechar)
+def clientMain(conn, addr, aoConcluir):
+	try:
+		# um cliente que não manda nada não segura o trabalhador para sempre
+		conn.settimeout(config["tempoOcioso"])
+		try:
+			mensagem = conn.recv(1024)
+		except socket.timeout:
+			return
+		
+		if mensagem.startswith(VERSAO_QUADROS[:1]):
+			# protocolo com quadros: vários pedidos na mesma conexão; a sessão passa a ser dona da conexão
+			sessao = SessaoDeQuadros(conn, mensagem, aoConcluir)
+			conn = None
+			if sessao.atender():
+				sessoesEmEspera.devolver(sessao)
+		else:
+			# envia as k palavras mais frequentes
+			enviarMedindo(conn, responder(mensagem))
+	finally:
+		if conn is not None:
+			conn.close()
+			aoConcluir()
+
+
+
+# laço de cada thread do pool: atende as conexões da fila, uma por vez
+def trabalhadorMain(fila):
+	while True:
+		conn, addr = fila.retirar()
+		
+		# um cliente que cai no meio do atendimento não derruba o trabalhador, e nem um erro inesperado
+		try:
+			clientMain(conn, addr, fila.concluir)
+		except OSError:
+			pass
+		except Exception as erro:
+			print(f"Erro ao atender {addr}: {erro!r}", file = sys.stderr)
 
 
 
@@ -104,23 +2075,407 @@ def clientMain(server, clientList):
 | Main do Select
 +---------------
 '''
-def selectMain(server):
-	# define a lista de I/O de interesse
-	entradas = [server]
-	clientList = []
+# --| SessoesEmEspera |-- classe
+# as sessões com quadros que esperam o próximo pedido no select, sem ocupar nenhuma thread; os trabalhadores e as
+# threads do executor as devolvem ao select, e o acordam, por um par de sockets
+class SessoesEmEspera:
+	def __init__(self):
+		self.sessoes = {}	# socket da conexão -> sessão (só o laço do select mexe aqui)
+		self.devolvidas = queue.SimpleQueue()
+		self.despertador, self.campainha = socket.socketpair()
+		self.despertador.setblocking(False)
+		self.campainha.setblocking(False)
+		self.proximaVarredura = 0.0
+		self.parado = False
+		
+		# exclusão mútua
+		self.lock = Lock()
+	
+	
+	
+	# input: None
+	# output: None (faz o select acordar)
+	def acordar(self):
+		try:
+			self.campainha.send(b"\x00")
+		except OSError:
+			# o despertador já está cheio de bytes, então o select vai acordar de qualquer jeito
+			pass
+	
+	
+	
+	# input: uma sessão que espera o próximo pedido
+	# output: None (a sessão passa a ser lida pelo select; se o select já parou, ela é encerrada)
+	def devolver(self, sessao):
+		with self.lock:
+			if not self.parado:
+				self.devolvidas.put(sessao)
+				self.acordar()
+				return
+		sessao.encerrar()
+	
+	
+	
+	# input: None
+	# output: a lista dos sockets que o select deve esperar, além do socket do servidor (pega as sessões devolvidas,
+	# volta a atender as que estavam retidas e fecha as ociosas)
+	def entradas(self):
+		while not self.devolvidas.empty():
+			sessao = self.devolvidas.get()
+			self.sessoes[sessao.conn] = sessao
+		
+		agora = time.monotonic()
+		varrer = self.proximaVarredura <= agora
+		if varrer:
+			self.proximaVarredura = agora + min(1.0, config["tempoOcioso"]/2)
+		
+		for conn, sessao in list(self.sessoes.items()):
+			if sessao.retida and not sessao.cheia() and not sessao.atender():
+				del self.sessoes[conn]
+			elif varrer and sessao.ociosa(agora):
+				del self.sessoes[conn]
+				sessao.encerrar()
+		
+		# uma sessão com pedidos pendentes demais não é lida até alguma resposta ser enviada
+		return [self.despertador] + [conn for conn, sessao in self.sessoes.items() if not sessao.cheia()]
+	
+	
+	
+	# input: None
+	# output: quantos segundos o select pode esperar até a próxima varredura das sessões ociosas (None se não há sessões)
+	def prazo(self):
+		if not self.sessoes:
+			return None
+		return max(0.0, self.proximaVarredura - time.monotonic())
 	
-	# looping do servidor
-	loop = True
-	while loop:
+	
+	
+	# input: um socket que o select avisou que tem bytes chegando
+	# output: None
+	def pronta(self, conn):
+		if conn is self.despertador:
+			try:
+				while self.despertador.recv(4096):
+					pass
+			except BlockingIOError:
+				pass
+		elif not self.sessoes[conn].receber():
+			del self.sessoes[conn]
+	
+	
+	
+	# input: None
+	# output: None (encerra as sessões: cada uma fecha depois das suas respostas pendentes)
+	def parar(self):
+		with self.lock:
+			self.parado = True
+		self.entradas()
+		for sessao in self.sessoes.values():
+			sessao.encerrar()
+		self.sessoes.clear()
+
+
+
+sessoesEmEspera = None	# as sessões com quadros esperando no select, criadas pelo selectMain
+
+
+
+# input: o socket do servidor e, opcionalmente, um evento que, quando sinalizado, faz o laço parar de aceitar conexões
+# output: None
+def selectMain(server, parar = None):
+	global sessoesEmEspera
+	sessoesEmEspera = SessoesEmEspera()
+	
+	# cria o pool fixo de trabalhadores
+	for _ in range(config["trabalhadores"]):
+		trabalhador = Thread(target = trabalhadorMain, args = (filaDeConexoes,))
+		trabalhador.daemon = True
+		trabalhador.start()
+	
+	# looping do servidor (com um evento de parada, o select acorda de tempos em tempos para verificá-lo; com sessões
+	# esperando, acorda também para fechar as ociosas)
+	while parar is None or not parar.is_set():
+		# define a lista de I/O de interesse: o servidor e as sessões com quadros esperando o próximo pedido
+		entradas = [server] + sessoesEmEspera.entradas()
+		prazo = sessoesEmEspera.prazo()
+		if parar is not None:
+			prazo = 0.5 if prazo is None else min(prazo, 0.5)
+		
 		# espera por qualquer entrada de interesse
-		leitura, escrita, excecao = select.select(entradas,[],[])
+		leitura, escrita, excecao = select.select(entradas,[],[], prazo)
 		for pronto in leitura:
-			if pronto == server:
-				# cria uma nova thread para lidar com conexões novas
-				client = Thread(target=clientMain, args=(server, clientList))
-				clientList.append(client)
-				client.daemon = True
-				client.start()
+			if pronto != server:
+				# chegou um pedido numa sessão (ou o aviso de que uma sessão foi devolvida)
+				sessoesEmEspera.pronta(pronto)
+			else:
+				# aceita a conexão aqui mesmo e a coloca na fila dos trabalhadores
+				conn, addr = server.accept()
+				
+				# fila cheia: avisa o cliente que o servidor está ocupado
+				if not filaDeConexoes.colocar(conn, addr):
+					with conn:
+						try:
+							conn.sendall("Servidor ocupado".encode("utf-8"))
+						except OSError:
+							pass
+	
+	# parada graciosa: as sessões esperando no select fecham depois das suas respostas pendentes
+	sessoesEmEspera.parar()
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Main do Asyncio
++---------------
+'''
+# input: os streams da conexão, os bytes já recebidos dela e o executor da contagem
+# output: None (atende os quadros da conexão até o cliente fechá-la)
+async def sessaoDeQuadrosAsyncio(reader, writer, sobra, executor):
+	loop = asyncio.get_running_loop()
+	buffer = bytearray(sobra)
+	
+	# espera o buffer ter a quantidade de bytes pedida, ou retorna False se a conexão fechou com o buffer vazio
+	# (nada sai do buffer aqui, então um tempo esgotado pode ser repetido sem perder bytes)
+	async def garantir(tamanho):
+		while len(buffer) < tamanho:
+			dado = await reader.read(65536)
+			if not dado:
+				if buffer:
+					raise ConnectionError("conexão fechada no meio de um quadro")
+				return False
+			buffer.extend(dado)
+		return True
+	
+	# tira a quantidade de bytes pedida do buffer
+	def consumir(tamanho):
+		dado = bytes(buffer[:tamanho])
+		del buffer[:tamanho]
+		return dado
+	
+	if not await garantir(len(VERSAO_QUADROS)) or consumir(len(VERSAO_QUADROS)) != VERSAO_QUADROS:
+		return
+	
+	lockDeEnvio = asyncio.Lock()
+	pendentes = asyncio.Semaphore(config["maxPedidosPendentes"])
+	tarefas = set()
+	
+	# os quadros de progresso vêm da thread do executor e são escritos pelo laço de eventos, antes da resposta
+	def enviarProgresso(quadro):
+		loop.call_soon_threadsafe(writer.write, quadro)
+	
+	# processa um pedido no executor e envia a resposta assim que ela fica pronta (ou um quadro de erro, se o atendimento falhou)
+	async def atender(quadro):
+		try:
+			try:
+				resposta = await loop.run_in_executor(executor, responderQuadro, quadro, enviarProgresso)
+			except Exception as erro:
+				resposta = quadroDeErro(quadro, erro)
+			async with lockDeEnvio:
+				inicio = time.perf_counter()
+				writer.write(resposta)
+				await writer.drain()
+				metricas.registrarEnvio(time.perf_counter() - inicio, len(resposta))
+		finally:
+			pendentes.release()
+	
+	# lê os pedidos sem esperar as respostas; se há pedidos pendentes demais, para de ler até algum terminar;
+	# a conexão fica aberta entre os pedidos, mas é fechada se ficar ociosa por tempo demais
+	atendidos = 0
+	while atendidos < config["maxPedidosPorConexao"]:
+		try:
+			if not await asyncio.wait_for(garantir(4), config["tempoOcioso"]):
+				break
+			tamanho = int.from_bytes(buffer[:4], byteorder = "little")
+			if MAX_QUADRO < tamanho:
+				raise ConnectionError("quadro grande demais")
+			await asyncio.wait_for(garantir(4 + tamanho), config["tempoOcioso"])
+		except asyncio.TimeoutError:
+			# só está ociosa se não há nenhuma resposta a caminho
+			if not tarefas:
+				break
+			continue
+		consumir(4)
+		quadro = consumir(tamanho)
+		
+		await pendentes.acquire()
+		tarefa = asyncio.create_task(atender(quadro))
+		tarefas.add(tarefa)
+		tarefa.add_done_callback(tarefas.discard)
+		atendidos += 1
+	
+	# espera as respostas pendentes antes de fechar a conexão
+	await asyncio.gather(*tarefas, return_exceptions = True)
+
+
+
+# input: os streams de leitura e escrita da conexão, o limite de conexões e o executor da contagem
+# output: None
+async def clientAsyncio(reader, writer, limiteDeConexoes, executor):
+	# espera a vez se já há conexões demais sendo atendidas
+	async with limiteDeConexoes:
+		try:
+			# um cliente que não manda nada não segura a vaga para sempre
+			mensagem = await asyncio.wait_for(reader.read(1024), config["tempoOcioso"])
+			
+			if mensagem.startswith(VERSAO_QUADROS[:1]):
+				# protocolo com quadros: vários pedidos na mesma conexão
+				await sessaoDeQuadrosAsyncio(reader, writer, mensagem, executor)
+			else:
+				# conta as palavras numa thread do executor, sem travar o laço de eventos
+				resposta = await asyncio.get_running_loop().run_in_executor(executor, responder, mensagem)
+				
+				# envia as k palavras mais frequentes
+				inicio = time.perf_counter()
+				writer.write(resposta)
+				await writer.drain()
+				metricas.registrarEnvio(time.perf_counter() - inicio, len(resposta))
+		except (ConnectionError, asyncio.TimeoutError):
+			pass
+		finally:
+			# fecha a conexão
+			writer.close()
+
+
+
+# input: o socket do servidor, já escutando
+# output: None (atende as conexões até o programa terminar)
+async def asyncioMain(server):
+	limiteDeConexoes = asyncio.Semaphore(config["maxConexoes"])
+	executor = obterExecutorDePedidos()
+	
+	servidor = await asyncio.start_server(
+		lambda reader, writer: clientAsyncio(reader, writer, limiteDeConexoes, executor),
+		sock = server
+	)
+	
+	async with servidor:
+		await servidor.serve_forever()
+
+
+
+# ----------------
+
+
+
+'''
++---------------
+| Main dos Processos
++---------------
+'''
+# input: se a porta pode ser compartilhada com outros processos (SO_REUSEPORT)
+# output: o socket do servidor, já escutando no endereço da configuração
+def abrirSocket(compartilhado = False):
+	server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	if compartilhado:
+		server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+	server.bind((config["host"], config["port"]))
+	server.listen(config["backlog"])
+	return server
+
+
+
+# laço de cada processo do grupo: abre o seu próprio socket na porta compartilhada (o sistema operacional distribui
+# as conexões entre os processos) e atende no modo select até o grupo ser parado
+def processoMain(configuracao, indice, contadores, parar):
+	global cache, filaDeConexoes, pedidosDoProcesso
+	
+	# o Ctrl+C do terminal chega a todos os processos; quem decide parar o grupo é o processo principal
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	
+	config.update(configuracao)
+	cache = CacheDeContagens(config["cacheMaxEntradas"], config["cacheMaxBytes"])
+	filaDeConexoes = FilaDeConexoes(config["profundidadeDaFila"])
+	pedidosDoProcesso = (contadores, indice)
+	
+	# cada processo tem o seu cache e as suas métricas, então cada um faz o seu aquecimento e grava as suas estatísticas
+	if config["diretorioDeAquecimento"]:
+		aquecimentoThread = Thread(target = Aquecimento(config["diretorioDeAquecimento"], config["concorrenciaDoAquecimento"]).executar)
+		aquecimentoThread.daemon = True
+		aquecimentoThread.start()
+	if config["arquivoDeMetricas"]:
+		metricasThread = Thread(target = gravarMetricas, args = (config["arquivoDeMetricas"], config["intervaloDeMetricas"]))
+		metricasThread.daemon = True
+		metricasThread.start()
+	
+	server = abrirSocket(compartilhado = True)
+	selectMain(server, parar)
+	
+	# parada graciosa: deixa de aceitar conexões e termina as que já foram aceitas
+	server.close()
+	while filaDeConexoes.ocupada():
+		time.sleep(0.05)
+	
+	# os pools de processos deste processo precisam ser parados aqui: ao sair, um processo filho espera os seus
+	# próprios filhos, e os processos dos pools só terminam quando o pool é parado
+	for executor in (executorDeContagem, executorDePalindromos):
+		if executor is not None:
+			executor.shutdown()
+
+
+
+# --| GrupoDeProcessos |-- classe
+# processos do servidor que atendem na mesma porta, cada um com o seu GIL, o seu cache e o seu pool de trabalhadores
+class GrupoDeProcessos:
+	def __init__(self, quantidade):
+		# spawn em vez de fork, pelo mesmo motivo do executor da contagem
+		contexto = multiprocessing.get_context("spawn")
+		self.contadores = contexto.Array("Q", quantidade)	# pedidos atendidos por cada processo
+		self.parar = contexto.Event()
+		
+		# os processos já estão usando os núcleos, então cada um conta os arquivos grandes sozinho, a não ser que a
+		# configuração escolha outro número
+		configuracao = dict(config)
+		configuracao["processosDeContagem"] = config["processosDeContagem"] or 1
+		
+		# os processos não são daemon, porque um processo daemon não pode abrir os pools de processos da contagem e dos
+		# palíndromos; por isso o processo principal sempre os para com o encerrar
+		self.processos = [
+			contexto.Process(target = processoMain, args = (configuracao, indice, self.contadores, self.parar))
+			for indice in range(quantidade)
+		]
+	
+	
+	
+	# input: None
+	# output: None (inicia todos os processos)
+	def iniciar(self):
+		for processo in self.processos:
+			processo.start()
+	
+	
+	
+	# input: quantos segundos esperar os processos terminarem o que já aceitaram
+	# output: None (para todos os processos, encerrando à força os que passarem do tempo limite)
+	def encerrar(self, tempoLimite = 10.0):
+		self.parar.set()
+		
+		prazo = time.perf_counter() + tempoLimite
+		for processo in self.processos:
+			processo.join(max(0.0, prazo - time.perf_counter()))
+		
+		for processo in self.processos:
+			if processo.is_alive():
+				processo.terminate()
+				processo.join()
+	
+	
+	
+	# input: None
+	# output: um dict com os pedidos atendidos por cada processo e no total
+	def estatisticas(self):
+		pedidos = list(self.contadores)
+		return {
+			"processos": [
+				{"pid": processo.pid, "vivo": processo.is_alive(), "pedidos": pedidos[indice]}
+				for indice, processo in enumerate(self.processos)
+			],
+			"pedidos": sum(pedidos)
+		}
 
 
 
@@ -134,19 +2489,72 @@ def selectMain(server):
 +---------------
 '''
 if __name__ == "__main__":
-	# Criação do socket
-	HOST = 'localhost'
-	PORT = 5000
+	# Carrega a configuração
+	carregarConfig(os.path.join(os.path.dirname(os.path.abspath(__file__)), "serverConfig.json"))
 	
-	server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-	server.bind((HOST, PORT))
-	server.listen(4)
+	# Vários processos na mesma porta (o SO_REUSEPORT só existe em alguns sistemas, como o Linux)
+	grupo = None
+	if 1 < config["processosDoServidor"]:
+		if hasattr(socket, "SO_REUSEPORT"):
+			grupo = GrupoDeProcessos(config["processosDoServidor"])
+			grupo.iniciar()
+		else:
+			print("Este sistema não tem SO_REUSEPORT; o servidor vai usar um só processo.")
 	
-	# Cria uma thread para lidar com o select (no windows, o sys.stdin não funciona no select)
-	selectThread = Thread(target = selectMain, args = (server,))
-	selectThread.daemon = True
-	selectThread.start()
+	if grupo is not None:
+		# Comandos do operador
+		comandos = {
+			"processos": lambda: print(json.dumps(grupo.estatisticas()))
+		}
+	else:
+		cache = CacheDeContagens(config["cacheMaxEntradas"], config["cacheMaxBytes"])
+		filaDeConexoes = FilaDeConexoes(config["profundidadeDaFila"])
+		
+		# Conta os arquivos do diretório de aquecimento em segundo plano, enquanto o servidor já atende
+		aquecimento = None
+		if config["diretorioDeAquecimento"]:
+			aquecimento = Aquecimento(config["diretorioDeAquecimento"], config["concorrenciaDoAquecimento"])
+			aquecimentoThread = Thread(target = aquecimento.executar)
+			aquecimentoThread.daemon = True
+			aquecimentoThread.start()
+		
+		# Grava as estatísticas periodicamente, se foi pedido
+		if config["arquivoDeMetricas"]:
+			metricasThread = Thread(target = gravarMetricas, args = (config["arquivoDeMetricas"], config["intervaloDeMetricas"]))
+			metricasThread.daemon = True
+			metricasThread.start()
+		
+		# Criação do socket
+		server = abrirSocket()
+		
+		# Cria uma thread para lidar com as conexões (no windows, o sys.stdin não funciona no select)
+		if config["modo"] == "asyncio":
+			serverThread = Thread(target = lambda: asyncio.run(asyncioMain(server)))
+		else:
+			serverThread = Thread(target = selectMain, args = (server,))
+		serverThread.daemon = True
+		serverThread.start()
+		
+		# Comandos do operador
+		comandos = {
+			"cache": lambda: print(json.dumps(cache.estatisticas())),
+			"fila": lambda: print(json.dumps(filaDeConexoes.estatisticas())),
+			"contagens": lambda: print(json.dumps(contagensEmAndamento.estatisticas())),
+			"metricas": lambda: print(json.dumps(metricas.estatisticas()))
+		}
+		if aquecimento is not None:
+			comandos["aquecimento"] = lambda: print(json.dumps(aquecimento.estatisticas()))
 	
-	# Finaliza o programa com qualquer input
-	input("Pressione qualquer tecla para terminar.")
-	server.close()
\ No newline at end of file
+	# Executa comandos até receber algo que não é comando; aí finaliza o programa
+	print("Comandos: " + ", ".join(comandos) + ".")
+	try:
+		comando = input("Digite um comando, ou pressione qualquer tecla para terminar.\n")
+		while comando in comandos:
+			comandos[comando]()
+			comando = input()
+	finally:
+		# os processos do grupo não são daemon: sem o encerrar, o programa ficaria esperando por eles
+		if grupo is not None:
+			grupo.encerrar()
+		else:
+			server.close()